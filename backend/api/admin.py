@@ -1,8 +1,15 @@
 from django.contrib import admin
-from .models import User
+from .models import ProfilePictureJob, User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ('username', 'email', 'created_at')
     search_fields = ('username', 'email')
     list_filter = ('created_at',)
+
+@admin.register(ProfilePictureJob)
+class ProfilePictureJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'created_at', 'updated_at')
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
@@ -0,0 +1,110 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Small thread-safe LRU of authenticated users with a TTL.
+
+    Entries live in process memory, so a write handled by another worker is
+    only picked up here once the entry expires; keep the TTL short.
+    """
+
+    def __init__(self, max_size=1024, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Hand out a copy so request code can't mutate the cached instance
+        return copy.deepcopy(user)
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(user))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop every cached entry of a user, whatever token it came from."""
+        user_id = str(user_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache_settings = getattr(settings, 'AUTH_USER_CACHE', {})
+user_cache = UserCache(
+    max_size=_cache_settings.get('MAX_SIZE', 1024),
+    ttl=_cache_settings.get('TTL', 30),
+)
+
+
+def invalidate_cached_user(user_id):
+    user_cache.invalidate(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that reuses recently loaded users instead of a SELECT per request."""
+
+    def get_user(self, validated_token):
+        key = (
+            str(validated_token.get(api_settings.USER_ID_CLAIM)),
+            validated_token.get('iat'),
+        )
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        return user
+
+
+class TokenClaimsAuthentication(JWTStatelessUserAuthentication):
+    """
+    For endpoints that only need the user's ID: request.user is a TokenUser
+    built from the token claims, with no database access. Filter by
+    ``user_id=request.user.id`` rather than ``user=request.user``.
+    """
+
+
+def user_id_from_token(request):
+    """
+    Return the user ID carried by the request's access token, or None.
+
+    Only decodes and verifies the token, so it is safe to call from async views.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
+    return validated_token.get(api_settings.USER_ID_CLAIM)
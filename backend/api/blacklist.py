@@ -0,0 +1,190 @@
+"""
+In-memory pre-check for the refresh token blacklist.
+
+simplejwt checks every refresh token it verifies against the token_blacklist
+tables, which grow with every logout. Each process keeps a Bloom filter of
+the blacklisted, unexpired token IDs (jti) instead: a token the filter has
+never seen is certainly not blacklisted and skips the database; only a
+possible match (a blacklisted token or a rare false positive) runs
+simplejwt's query.
+
+The filter is built from the BlacklistedToken table on first use and every
+BLACKLIST_FILTER_REBUILD_SECONDS, which also drops expired tokens. Between
+rebuilds, new blacklist entries reach every process through the shared
+cache: each write bumps a version counter and stores its jti under that
+version, and a process that sees a newer version adds the jtis it missed. If
+those entries were evicted, or too many were written, it rebuilds instead.
+
+That catch-up is only sound when every process shares the cache and the
+version counter is bumped atomically, so two logouts can't claim the same
+entry. settings.TOKEN_BLACKLIST_PRECHECK turns the filter on for Redis (and
+for the single-process debug server and tests); otherwise every token goes
+to the database as it does in plain simplejwt.
+
+The prune_tokens command deletes expired tokens from both tables in batches.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+BLACKLIST_VERSION_KEY = 'token-blacklist:version'
+BLACKLIST_ENTRY_TIMEOUT = 60 * 60
+BLACKLIST_FILTER_REBUILD_SECONDS = 60 * 60
+# More missed entries than this are cheaper to pick up with a rebuild
+MAX_CATCH_UP = 1000
+
+# The filter is sized for twice the blacklist it is built from, so it stays
+# under FALSE_POSITIVE_RATE while new entries are added until the next rebuild
+MIN_CAPACITY = 10000
+FALSE_POSITIVE_RATE = 0.01
+
+
+def _entry_key(version):
+    return f'token-blacklist:{version}'
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter of strings."""
+
+    def __init__(self, capacity, false_positive_rate=FALSE_POSITIVE_RATE):
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: two 64-bit halves of one digest give every position
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def _seed_version(cache):
+    # Seeded from the clock, so a version recreated after the cache is
+    # cleared is newer than any a process has seen and forces a rebuild
+    cache.add(BLACKLIST_VERSION_KEY, int(time.time() * 1000), None)
+    return cache.get(BLACKLIST_VERSION_KEY)
+
+
+def publish_blacklisted(jti):
+    """Tell every process's filter about a newly blacklisted token. Call after the row is committed."""
+    try:
+        version = default_cache.incr(BLACKLIST_VERSION_KEY)
+    except ValueError:
+        # Every process rebuilds from the table on the new version
+        _seed_version(default_cache)
+        return
+    default_cache.set(_entry_key(version), jti, BLACKLIST_ENTRY_TIMEOUT)
+
+
+class BlacklistFilter:
+    """This process's view of the blacklist; see the module docstring."""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else default_cache
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._version = None
+        self._built_at = 0
+
+    def might_contain(self, jti):
+        """False when the token is certainly not blacklisted; True when the database must decide."""
+        if not getattr(settings, 'TOKEN_BLACKLIST_PRECHECK', False):
+            return True
+        version = self.cache.get(BLACKLIST_VERSION_KEY)
+        with self._lock:
+            if (
+                self._bloom is None or version is None or version < self._version
+                or time.monotonic() - self._built_at > BLACKLIST_FILTER_REBUILD_SECONDS
+            ):
+                self._rebuild()
+            elif version > self._version:
+                self._catch_up(version)
+            return jti in self._bloom
+
+    def _rebuild(self):
+        # Taken before reading the table: entries published during the scan
+        # are added again on the next check, which is harmless
+        version = self.cache.get(BLACKLIST_VERSION_KEY)
+        if version is None:
+            version = _seed_version(self.cache)
+        jtis = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .values_list('token__jti', flat=True)
+        )
+        bloom = BloomFilter(max(MIN_CAPACITY, 2 * len(jtis)))
+        for jti in jtis:
+            bloom.add(jti)
+        self._bloom, self._version, self._built_at = bloom, version, time.monotonic()
+
+    def _catch_up(self, version):
+        if version - self._version > MAX_CATCH_UP:
+            self._rebuild()
+            return
+        keys = [_entry_key(missed) for missed in range(self._version + 1, version + 1)]
+        entries = self.cache.get_many(keys)
+        if len(entries) < len(keys):
+            self._rebuild()
+            return
+        for jti in entries.values():
+            self._bloom.add(jti)
+        self._version = version
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken that only queries the blacklist when blacklist_filter can't rule the token out."""
+
+    def check_blacklist(self):
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+def prune_expired_tokens(batch_size=1000, pause=0.0):
+    """
+    Delete expired outstanding tokens and their blacklist entries.
+
+    Walks the outstanding tokens by primary key, batch_size rows at a time,
+    and deletes each batch's expired rows in its own short transaction, so no
+    lock is held for long and the table is read only once. Returns the
+    number of outstanding tokens deleted.
+    """
+    now = timezone.now()
+    deleted = 0
+    last_id = 0
+    while True:
+        rows = list(
+            OutstandingToken.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'expires_at')[:batch_size]
+        )
+        if not rows:
+            return deleted
+        last_id = rows[-1][0]
+        expired = [token_id for token_id, expires_at in rows if expires_at <= now]
+        if not expired:
+            continue
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=expired).delete()
+            _, counts = OutstandingToken.objects.filter(id__in=expired).delete()
+        deleted += counts.get(OutstandingToken._meta.label, 0)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,111 @@
+import logging
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import ProfilePictureJob, User
+
+logger = logging.getLogger(__name__)
+
+# Square avatar edge lengths in pixels; the largest becomes user.profile_picture
+AVATAR_SIZES = (64, 128, 256)
+AVATAR_QUALITY = 85
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# A job still Processing this long after it was claimed belongs to a worker
+# that died; it is handed out again, up to MAX_JOB_ATTEMPTS claims in all
+JOB_LEASE = timedelta(minutes=10)
+MAX_JOB_ATTEMPTS = 3
+
+
+def get_variant_storage():
+    """Return the storage the resized avatars are pushed to (PROFILE_PICTURE_STORAGE)."""
+    path = getattr(settings, 'PROFILE_PICTURE_STORAGE', None)
+    if not path:
+        return default_storage
+    return import_string(path)()
+
+
+def validate_image(upload):
+    """Cheap header check so the request can reject non-images without decoding them."""
+    if upload.size > MAX_UPLOAD_SIZE:
+        return 'Image is too large'
+    try:
+        Image.open(upload).verify()
+    except (UnidentifiedImageError, OSError):
+        return 'File is not a valid image'
+    finally:
+        upload.seek(0)
+    return None
+
+
+def render_variants(source):
+    """Yield (size, JPEG bytes) for every avatar size."""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for size in AVATAR_SIZES:
+            variant = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            buffer = BytesIO()
+            variant.save(buffer, 'JPEG', quality=AVATAR_QUALITY, optimize=True)
+            yield size, buffer.getvalue()
+
+
+def claim_next_job():
+    """Mark the oldest pending or abandoned job as processing and return it, or None."""
+    while True:
+        with transaction.atomic():
+            job = (
+                ProfilePictureJob.objects.select_for_update(skip_locked=True)
+                .filter(Q(status='Pending') | Q(status='Processing', updated_at__lt=timezone.now() - JOB_LEASE))
+                .order_by('id')
+                .first()
+            )
+            if job is None:
+                return None
+            if job.attempts >= MAX_JOB_ATTEMPTS:
+                # Most likely an upload that crashes the worker every time
+                job.status = 'Failed'
+                job.error = f'Abandoned after {job.attempts} attempts'
+                job.save(update_fields=['status', 'error', 'updated_at'])
+                continue
+            job.status = 'Processing'
+            job.attempts += 1
+            job.save(update_fields=['status', 'attempts', 'updated_at'])
+        return job
+
+
+def process_job(job, storage=None):
+    """Resize the job's upload, push the variants and point the user at them."""
+    storage = storage or get_variant_storage()
+    try:
+        names = {}
+        variants = {}
+        for size, content in render_variants(BytesIO(job.original)):
+            name = storage.save(f'avatars/{job.user_id}/{job.pk}_{size}.jpg', ContentFile(content))
+            names[size] = name
+            variants[str(size)] = storage.url(name)
+
+        user = User.objects.get(pk=job.user_id)
+        user.profile_picture = names[max(AVATAR_SIZES)]
+        user.profile_picture_variants = variants
+        # save() rather than update() so the cached-user signal fires
+        user.save(update_fields=['profile_picture', 'profile_picture_variants'])
+    except Exception as e:
+        logger.exception(f"Profile picture job {job.pk} failed")
+        job.status = 'Failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return job
+
+    job.status = 'Done'
+    job.original = b''
+    job.save(update_fields=['status', 'original', 'updated_at'])
+    return job
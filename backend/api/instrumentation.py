@@ -0,0 +1,199 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class RouteHistogram:
+    """Latency histogram and query totals of a single route."""
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.slow = 0
+
+    def observe(self, metrics, slow):
+        total_ms = metrics.total_ms
+        self.count += 1
+        self.buckets[bisect.bisect_left(BUCKETS_MS, total_ms)] += 1
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        self.db_ms += metrics.db_ms
+        self.queries += metrics.queries
+        self.max_queries = max(self.max_queries, metrics.queries)
+        self.slow += slow
+
+    def as_dict(self):
+        labels = [f'le_{bound}' for bound in BUCKETS_MS] + ['inf']
+        return {
+            'count': self.count,
+            'slow': self.slow,
+            'avg_ms': round(self.total_ms / self.count, 2),
+            'max_ms': round(self.max_ms, 2),
+            'avg_db_ms': round(self.db_ms / self.count, 2),
+            'avg_queries': round(self.queries / self.count, 2),
+            'max_queries': self.max_queries,
+            'buckets_ms': dict(zip(labels, self.buckets)),
+        }
+
+
+class RouteMetrics:
+    """Per-route histograms for this process, keyed by URL name."""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, metrics, slow=False):
+        with self._lock:
+            histogram = self._routes.get(route)
+            if histogram is None:
+                histogram = self._routes[route] = RouteHistogram()
+            histogram.observe(metrics, slow)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: histogram.as_dict() for route, histogram in sorted(self._routes.items())}
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_metrics = RouteMetrics()
+
+
+class RequestMetrics:
+    """Timings collected while handling one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_end = None
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.total_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper: counts and times every query
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - start) * 1000
+
+    @property
+    def view_ms(self):
+        if self.view_start is None:
+            return 0.0
+        return ((self.view_end or time.perf_counter()) - self.view_start) * 1000
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_ms:.2f};desc="{self.queries} queries"',
+            f'view;dur={self.view_ms:.2f}',
+            f'render;dur={self.render_ms:.2f}',
+            f'total;dur={self.total_ms:.2f}',
+        ])
+
+
+class InstrumentationMiddleware:
+    """
+    Opt-in request instrumentation (settings.REQUEST_INSTRUMENTATION).
+
+    Records query count, SQL time, view time and response rendering time per
+    request, sends them back as a Server-Timing header, feeds route_metrics
+    and logs requests slower than settings.SLOW_REQUEST_MS. When disabled the
+    middleware removes itself from the stack at startup.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'SLOW_REQUEST_MS', 500)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = request._metrics = RequestMetrics()
+        with self.wrap_connections(metrics):
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = request._metrics = RequestMetrics()
+        # Connections belong to a thread. The request's ORM calls, sync views
+        # included, all run on the one thread sync_to_async picks for it, so
+        # the wrappers are installed on that thread's connections.
+        stack = await sync_to_async(self.wrap_connections)(metrics)
+        with stack:
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    def wrap_connections(self, metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def finish(self, request, response, metrics):
+        if metrics.view_end is None:
+            metrics.view_end = time.perf_counter()
+        metrics.total_ms = (time.perf_counter() - metrics.start) * 1000
+
+        response['Server-Timing'] = metrics.server_timing()
+        match = request.resolver_match
+        route = match.view_name if match else 'unresolved'
+        slow = metrics.total_ms >= self.slow_request_ms
+        route_metrics.observe(route, metrics, slow)
+        if slow:
+            logger.warning(
+                f"Slow request {request.method} {request.path} ({route}): "
+                f"{metrics.total_ms:.0f} ms, {metrics.queries} queries in {metrics.db_ms:.0f} ms, "
+                f"view {metrics.view_ms:.0f} ms, render {metrics.render_ms:.0f} ms"
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that separately
+        metrics = request._metrics
+        metrics.view_end = time.perf_counter()
+        render = response.render
+
+        def timed_render():
+            start = time.perf_counter()
+            try:
+                return render()
+            finally:
+                metrics.render_ms += (time.perf_counter() - start) * 1000
+
+        response.render = timed_render
+        return response
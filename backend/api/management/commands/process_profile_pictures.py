@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.images import claim_next_job, process_job
+
+
+class Command(BaseCommand):
+    help = 'Work through queued profile picture uploads, generating and storing avatar variants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            job = process_job(job)
+            self.stdout.write(f'Job {job.pk}: {job.status}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.blacklist import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWT refresh tokens in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        deleted = prune_expired_tokens(options['batch_size'], options['pause'])
+        self.stdout.write(f'Deleted {deleted} expired tokens')
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import migrations, models
+
+
+def get_upload_storage():
+    # Frozen copy; the uploads moved into the job row in 0006
+    return FileSystemStorage(location=getattr(
+        settings, 'PROFILE_PICTURE_UPLOAD_ROOT', settings.BASE_DIR / 'uploads'
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_user_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='ProfilePictureJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.FileField(storage=get_upload_storage, upload_to='profile_picture_jobs/')),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Done', 'Done'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profile_picture_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
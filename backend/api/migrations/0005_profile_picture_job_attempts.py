@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_profile_picture_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profilepicturejob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
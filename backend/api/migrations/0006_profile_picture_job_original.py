@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def copy_uploads(apps, schema_editor):
+    """Move queued uploads off the local disk into the job row."""
+    ProfilePictureJob = apps.get_model('api', 'ProfilePictureJob')
+    for job in ProfilePictureJob.objects.filter(status__in=['Pending', 'Processing']).exclude(source=''):
+        try:
+            with job.source.open('rb') as source:
+                job.original = source.read()
+        except OSError:
+            # Written on another machine's disk, which this one cannot read
+            job.status = 'Failed'
+            job.error = 'Upload was lost'
+        job.save(update_fields=['original', 'status', 'error'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_profile_picture_job_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profilepicturejob',
+            name='original',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(copy_uploads, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='profilepicturejob',
+            name='source',
+        ),
+    ]
@@ -11,6 +11,8 @@ class User(AbstractUser):
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     profile_picture = CloudinaryField('profile_picture', null=True, blank=True)
+    # Resized avatar URLs keyed by edge length in pixels, filled in by process_profile_pictures
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     
     # Dietary preferences
     is_vegetarian = models.BooleanField(default=False)
@@ -38,4 +40,27 @@ class User(AbstractUser):
         "auth.Permission",
         related_name="custom_user_permissions",
         blank=True
-    )
\ No newline at end of file
+    )
+
+
+class ProfilePictureJob(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Processing', 'Processing'),
+        ('Done', 'Done'),
+        ('Failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='profile_picture_jobs')
+    # Original upload, kept in the row (web and worker processes share no disk)
+    # until the worker has pushed the variants
+    original = models.BinaryField(default=b'')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    error = models.TextField(blank=True)
+    # Claims so far, including ones whose worker died before finishing
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Profile picture job {self.id} - {self.status}"
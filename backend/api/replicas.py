@@ -0,0 +1,125 @@
+"""
+Read replica routing.
+
+With replicas configured (settings.REPLICA_DATABASES, filled from
+REPLICA_DATABASE_URLS), reads of the catalog and order models are spread over
+the replicas while every write, and every read inside a transaction, goes to
+the primary ('default'). Users, carts and sessions are always read from the
+primary.
+
+Replicas lag behind the primary, so a client that writes is pinned to the
+primary for settings.REPLICA_PIN_SECONDS: ReplicaPinningMiddleware pins every
+POST/PUT/PATCH/DELETE request and records the pin in the default cache under
+the user ID from the request's access token, so the user's next reads (their
+cart, new order, toggled favorite) see what they just wrote, whichever worker
+serves them. That only holds if every worker sees the same cache (Redis,
+see settings.CACHES): with a process-local cache a read on another worker
+misses the pin, so the middleware refuses to start with one outside debug
+mode and tests. The middleware runs natively under both WSGI and ASGI, so the
+async views are not pushed onto a thread by it.
+
+Locally, point REPLICA_DATABASE_URLS at copies of the SQLite database (or at
+the same file) to exercise the routing.
+"""
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .authentication import user_id_from_token
+
+# Apps whose reads may be served slightly stale
+REPLICA_READ_APPS = {'products', 'orders'}
+
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# Cache backends that keep a separate copy per process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_pinned = contextvars.ContextVar('replica_pinned', default=False)
+
+
+def pin_cache_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'REPLICA_DATABASES', [])
+        if not replicas or model._meta.app_label not in REPLICA_READ_APPS or is_pinned():
+            return DEFAULT_DB_ALIAS
+        # A transaction on the primary must read its own writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+
+class ReplicaPinningMiddleware:
+    """Pin writers to the primary database; removes itself when no replicas are configured."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REPLICA_DATABASES', []):
+            raise MiddlewareNotUsed
+        if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES and not (
+            settings.DEBUG or getattr(settings, 'TESTING', False)
+        ):
+            raise ImproperlyConfigured('Pinning writers to the primary needs a cache shared by every worker')
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        user_id = user_id_from_token(request)
+        writing = request.method in UNSAFE_METHODS
+        pinned = writing or (user_id is not None and cache.get(pin_cache_key(user_id)) is not None)
+
+        token = _pinned.set(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        if writing and user_id is not None:
+            cache.set(pin_cache_key(user_id), 1, self.pin_seconds)
+        return response
+
+    async def __acall__(self, request):
+        user_id = user_id_from_token(request)
+        writing = request.method in UNSAFE_METHODS
+        pinned = writing or (user_id is not None and await cache.aget(pin_cache_key(user_id)) is not None)
+
+        # Sync views reached through sync_to_async run in a copy of this context
+        token = _pinned.set(pinned)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        if writing and user_id is not None:
+            await cache.aset(pin_cache_key(user_id), 1, self.pin_seconds)
+        return response
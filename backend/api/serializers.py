@@ -13,7 +13,9 @@ class UserSerializer(serializers.ModelSerializer):
                  'profile_picture', 'date_joined', 'is_vegetarian', 
                  'is_vegan', 'is_pescatarian', 'is_flexitarian', 'is_paleo', 
                  'is_ketogenic', 'is_halal', 'is_kosher', 'is_fruitarian', 
-                 'is_gluten_free', 'is_dairy_free', 'is_organic', 'password']
+                 'is_gluten_free', 'is_dairy_free', 'is_organic', 'password',
+                 'profile_picture_variants']
+        read_only_fields = ['profile_picture_variants']
         extra_kwargs = {
             'password': {'write_only': True},
             'profile_picture': {'required': False},
@@ -0,0 +1,159 @@
+"""
+Token bucket throttles for the login, cart and checkout endpoints.
+
+Each client gets a bucket per scope holding up to N tokens, refilled at N per
+period for a REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] rate of 'N/period'. A
+request takes a token (or one per operation of a cart batch) or is rejected
+with 429 and a Retry-After of the time until there are enough. Unlike DRF's
+SimpleRateThrottle, which keeps and trims a list of request timestamps per
+client, a bucket is two numbers, so each decision is O(1) and never touches
+the database.
+
+Buckets live in process memory by default (LocalBucketStore), so each worker
+enforces the rate on its own. Set THROTTLE_BUCKET_STORE to
+'api.throttling.CacheBucketStore' to share buckets between workers through
+the Django cache, at the cost of a cache round trip per request.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LocalBucketStore:
+    """Buckets in process memory; the least recently used are dropped past max_size."""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        """Take cost tokens from the bucket. Returns (allowed, seconds until there are enough)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens, wait = _take(tokens, now - updated_at, capacity, refill_rate, cost)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_size:
+                # A dropped bucket comes back full, which only ever lets a request through
+                self._buckets.popitem(last=False)
+        return wait is None, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets in the shared Django cache.
+
+    The read and write of a bucket are not atomic, so requests from one
+    client racing on different workers may share a token; the rate holds to
+    within the client's concurrency.
+    """
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        now = time.time()
+        tokens, updated_at = cache.get(key) or (capacity, now)
+        tokens, wait = _take(tokens, max(0, now - updated_at), capacity, refill_rate, cost)
+        # An untouched bucket is full again by the time its entry expires
+        cache.set(key, (tokens, now), math.ceil(capacity / refill_rate))
+        return wait is None, wait
+
+    def clear(self):
+        # Buckets go with cache.clear()
+        pass
+
+
+def _take(tokens, elapsed, capacity, refill_rate, cost):
+    tokens = min(capacity, tokens + elapsed * refill_rate)
+    # A request bigger than the bucket takes all of a full one
+    cost = min(cost, capacity)
+    if tokens >= cost:
+        return tokens - cost, None
+    return tokens, (cost - tokens) / refill_rate
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = getattr(settings, 'THROTTLE_BUCKET_STORE', 'api.throttling.LocalBucketStore')
+                _store = import_string(path)()
+    return _store
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle with its timestamp history replaced by a token bucket per client."""
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+    # A store for this throttle's buckets only; None uses THROTTLE_BUCKET_STORE
+    bucket_store = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        store = self.bucket_store or get_bucket_store()
+        allowed, self.retry_after = store.take(
+            self.key, self.num_requests, self.num_requests / self.duration, self.get_cost(request, view)
+        )
+        return allowed
+
+    def get_cost(self, request, view):
+        """Tokens the request takes."""
+        return 1
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """One bucket per client IP."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """One bucket per signed-in user, falling back to the client IP."""
+
+    def get_cache_key(self, request, view):
+        user_id = request.user.pk if request.user and request.user.is_authenticated else None
+        ident = f'user:{user_id}' if user_id is not None else self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginThrottle(IPTokenBucketThrottle):
+    # Before any User lookup or password hash
+    scope = 'login'
+
+
+class CartThrottle(UserTokenBucketThrottle):
+    scope = 'cart'
+
+
+class CartBatchThrottle(CartThrottle):
+    """Shares the cart bucket, taking one token per operation of the batch."""
+
+    def get_cost(self, request, view):
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        return max(1, len(operations)) if isinstance(operations, list) else 1
+
+
+class CheckoutThrottle(UserTokenBucketThrottle):
+    scope = 'checkout'
@@ -14,7 +14,11 @@ urlpatterns = [
     # Profile endpoints
     path('profile/update/', ProfileUpdateView.as_view(), name='profile-update'),
     path('profile/picture/', ProfilePictureUpdateView.as_view(), name='profile-picture-update'),
+    path('profile/picture/jobs/<int:job_id>/', ProfilePictureJobView.as_view(), name='profile-picture-job'),
     path('profile/dietary-preferences/', DietaryPreferencesView.as_view(), name='dietary-preferences'),
+
+    # Admin-only request instrumentation
+    path('metrics/', RequestMetricsView.as_view(), name='request-metrics'),
 ]
 
 # Add this to serve media files during development
@@ -2,12 +2,18 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from django.conf import settings
 from django.contrib.auth import authenticate
 from rest_framework import status
 import logging
+from django.shortcuts import get_object_or_404
 from .serializers import UserSerializer
-from .models import User
+from .models import ProfilePictureJob, User
+from .images import process_job, validate_image
+from .instrumentation import route_metrics
+from .blacklist import FilteredRefreshToken
+from .throttling import LoginThrottle
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +35,8 @@ class RegisterView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class LoginView(APIView):
+    throttle_classes = [LoginThrottle]
+
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
@@ -94,21 +102,48 @@ class ProfilePictureUpdateView(APIView):
             if 'profile_picture' not in request.FILES:
                 return Response({"error": "No image provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Save the profile picture
-            user.profile_picture = request.FILES['profile_picture']
-            user.save()
+            upload = request.FILES['profile_picture']
+            error = validate_image(upload)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+            if settings.PROFILE_PICTURE_INLINE:
+                # No worker on this deploy, so resize within the request
+                job = ProfilePictureJob.objects.create(
+                    user=user, original=upload.read(), status='Processing', attempts=1
+                )
+                job = process_job(job)
+            else:
+                # Queue the upload; process_profile_pictures resizes and stores it
+                job = ProfilePictureJob.objects.create(user=user, original=upload.read())
+                logger.info(f"Queued profile picture job {job.id} for user {user.id}")
 
-            # Return the URL of the uploaded image - Add explicit URL retrieval
             return Response({
-                "message": "Profile picture updated successfully",
-                "profile_picture": user.profile_picture.url if user.profile_picture else None
-            }, status=status.HTTP_200_OK)
+                "message": "Profile picture upload accepted",
+                "job_id": job.id,
+                "status": job.status
+            }, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             logger.error(f"Error updating profile picture: {str(e)}")
             return Response({
                 "error": f"Error updating profile picture: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ProfilePictureJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ProfilePictureJob, id=job_id, user=request.user)
+        data = {"job_id": job.id, "status": job.status}
+        if job.status == 'Done':
+            # The worker runs in another process, so read the user fresh rather than from the auth cache
+            user = User.objects.get(pk=request.user.pk)
+            data["profile_picture"] = UserSerializer(user).data['profile_picture']
+            data["profile_picture_variants"] = user.profile_picture_variants
+        elif job.status == 'Failed':
+            data["error"] = job.error
+        return Response(data)
         
 
 class LogoutView(APIView):
@@ -116,7 +151,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data.get("refresh")
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()
             return Response({"message": "Successfully logged out"}, status=status.HTTP_200_OK)
         except Exception as e:
@@ -131,7 +166,7 @@ class TokenRefreshView(APIView):
             if not refresh_token:
                 return Response({"error": "Refresh token required"}, status=status.HTTP_400_BAD_REQUEST)
                 
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             return Response({
                 'access': str(token.access_token),
             })
@@ -159,4 +194,19 @@ class DietaryPreferencesView(APIView):
         
         user.save()
         
-        return Response(UserSerializer(user).data)
\ No newline at end of file
+        return Response(UserSerializer(user).data)
+
+class RequestMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # Histograms are per worker process; they reset when the worker restarts
+        return Response({
+            'enabled': settings.REQUEST_INSTRUMENTATION,
+            'slow_request_ms': settings.SLOW_REQUEST_MS,
+            'routes': route_metrics.snapshot(),
+        })
+
+    def delete(self, request):
+        route_metrics.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
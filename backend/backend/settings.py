@@ -11,6 +11,8 @@ from datetime import timedelta
 import os
 import dj_database_url
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
 #force deploy
 load_dotenv() 
 
@@ -21,7 +23,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-_$(6upf@o=)r!)nkyxqw_m3zw4&l@**5p-476r^fy(pqtu@=7t'
 
 # SECURITY WARNING: Don't run with debug on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'True') == 'True'
+
+# Set by the test environment (see the README), never in a deployment
+TESTING = os.getenv('DJANGO_TESTING', 'False') == 'True'
 
 ALLOWED_HOSTS = ["kang-inas.vercel.app", "127.0.0.1", "localhost"]
 
@@ -59,13 +64,48 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 # 🔹 REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
+    # Reverse proxies in front of the app (1 behind Heroku's router). Throttles
+    # identify clients by the X-Forwarded-For entry the nearest proxy appended;
+    # with 0 they use the connection's address and ignore the header
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+    # Token buckets of api.throttling: 'N/period' allows bursts of N, refilled at N per period
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('LOGIN_THROTTLE_RATE', '10/min'),
+        'cart': os.getenv('CART_THROTTLE_RATE', '120/min'),
+        'checkout': os.getenv('CHECKOUT_THROTTLE_RATE', '10/min'),
+    },
+}
+
+# Where throttle buckets live; api.throttling.CacheBucketStore shares them
+# between workers through the cache
+THROTTLE_BUCKET_STORE = os.getenv('THROTTLE_BUCKET_STORE', 'api.throttling.LocalBucketStore')
+
+# Recently authenticated users are reused for a short while instead of re-read per request
+AUTH_USER_CACHE = {
+    'MAX_SIZE': int(os.getenv('AUTH_USER_CACHE_MAX_SIZE', '1024')),
+    'TTL': int(os.getenv('AUTH_USER_CACHE_TTL', '30')),
 }
 
+# Default page size of the paginated catalog lists (products.pagination.CatalogCursorPagination)
+CATALOG_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '24'))
+
+# Serve the catalog lists as bare arrays (pre-pagination response shape)
+LEGACY_LIST_RESPONSES = os.getenv('LEGACY_LIST_RESPONSES', 'False') == 'True'
+
+# Admin changelists of tables bigger than this show the planner's estimated row count
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', '100000'))
+
+# Per-request SQL/timing instrumentation (Server-Timing headers, /api/metrics/)
+REQUEST_INSTRUMENTATION = os.getenv('REQUEST_INSTRUMENTATION', 'False') == 'True'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '500'))
+
 # 🔹 Middleware 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.instrumentation.InstrumentationMiddleware',  # Only active with REQUEST_INSTRUMENTATION
+    'api.replicas.ReplicaPinningMiddleware',  # Only active with read replicas configured
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS Middleware
     'django.middleware.common.CommonMiddleware',
@@ -98,15 +138,56 @@ TEMPLATES = [
 # 🔹 WSGI Application
 WSGI_APPLICATION = 'backend.wsgi.application'
 
-# 🔹 Database Configuration (Uses SQLite)
+# 🔹 Database Configuration (PostgreSQL from DATABASE_URL; tests fall back to a local SQLite file)
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.getenv('DATABASE_URL'),
+        default=os.getenv('DATABASE_URL', f"sqlite:///{BASE_DIR / 'db.sqlite3'}" if TESTING else None),
         conn_max_age=600,
         conn_health_checks=True,
     )
 }
 
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.sqlite3':
+    # Take the write lock when a transaction starts, so concurrent writers
+    # wait for each other instead of failing with "database is locked". The
+    # test database lives in a file (not shared-cache memory) for the same reason.
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE', 'timeout': 20}
+    DATABASES['default']['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}
+
+# 🔹 Cache
+# Catalog versions, favorites and other invalidations must reach every worker,
+# and the query budgets assume cache reads cost no queries, so deployments
+# require Redis. Process-local memory is only used for tests and local
+# development on SQLite.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+elif TESTING or DATABASES['default'].get('ENGINE') == 'django.db.backends.sqlite3':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    raise ImproperlyConfigured('REDIS_URL is not set; deployments need a Redis cache shared by every process')
+
+# Pub/sub behind the order status event stream (/api/async/orders/events/).
+# Events are pushed over Redis when there is one; otherwise streams poll the
+# database, which reaches every process too (run prune_order_events
+# periodically). The in-process broker only suits a single ASGI process.
+ORDER_EVENTS_BROKER = os.getenv(
+    'ORDER_EVENTS_BROKER', 'orders.events.RedisBroker' if REDIS_URL else 'orders.events.DatabaseBroker'
+)
+
+# Read replicas, as comma-separated database URLs; catalog and order reads are
+# spread over them by api.replicas.ReplicaRouter. Tests read them through default.
+REPLICA_DATABASES = []
+for index, url in enumerate(url.strip() for url in os.getenv('REPLICA_DATABASE_URLS', '').split(',') if url.strip()):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# How long a client that wrote keeps reading from the primary
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
 # 🔹 Password Validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -126,6 +207,16 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Profile picture uploads are queued in the database and resized by the
+# process_profile_pictures worker (the Procfile's worker process), which pushes
+# the variants to this storage. Deploys without a worker (Vercel) set
+# PROFILE_PICTURE_INLINE=True to resize within the upload request instead;
+# otherwise their uploads stay Pending until a worker runs.
+PROFILE_PICTURE_INLINE = os.getenv('PROFILE_PICTURE_INLINE', 'False') == 'True'
+PROFILE_PICTURE_STORAGE = os.getenv(
+    'PROFILE_PICTURE_STORAGE', 'cloudinary_storage.storage.MediaCloudinaryStorage'
+)
+
 # 🔹 Default Primary Key Field Type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -135,6 +226,7 @@ AUTH_USER_MODEL = 'api.User'
 # 🔹 CORS Configuration
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 # CORS_ALLOWED_ORIGINS = [
 #     "http://localhost:5173",
 #     "http://127.0.0.1:5173"
@@ -157,3 +249,8 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,  # Generates a new refresh token upon refresh
     'BLACKLIST_AFTER_ROTATION': True,  # Blacklist old refresh tokens
 }
+
+# Rule out refresh tokens missing from api.blacklist's in-memory filter without
+# a query. Needs Redis: other caches are per process or can't bump the
+# filter's version counter atomically, which would let a revoked token through.
+TOKEN_BLACKLIST_PRECHECK = bool(REDIS_URL) or DEBUG or TESTING
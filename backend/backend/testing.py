@@ -0,0 +1,265 @@
+"""
+Shared fixtures for the per-route query-count and latency budget tests.
+
+Every API route has an entry in ROUTE_BUDGETS; the app test modules
+exercise their routes against a realistically sized SQLite dataset and
+fail when a route runs more queries, or takes longer, than its budget.
+Set BUDGET_TIME_FACTOR to scale the time budgets on slow machines and
+BUDGET_REPORT to a file path to dump the recorded timings as JSON.
+"""
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import user_cache
+from api.models import User
+from api.throttling import get_bucket_store
+from cart.models import CartItem
+from orders.models import Order, OrderItem
+from products.dietary import parse_dietary_tags
+from products.models import Favorite, Product
+from products.search import rebuild_index
+
+Budget = namedtuple('Budget', ['queries', 'ms'])
+
+# Maximum queries and wall-clock milliseconds per request, keyed by URL name.
+# Query counts are for a cold cache, so they include the JWT user lookup.
+ROUTE_BUDGETS = {
+    # api
+    'register': Budget(4, 500),
+    'login': Budget(2, 500),
+    'user-detail': Budget(1, 200),
+    'logout': Budget(8, 300),
+    'token-refresh': Budget(1, 200),
+    'profile-update': Budget(2, 300),
+    'profile-picture-update': Budget(2, 500),
+    'profile-picture-job': Budget(3, 200),
+    'dietary-preferences': Budget(2, 200),
+    'request-metrics': Budget(1, 200),
+    # products
+    'products-search': Budget(4, 500),
+    'products-compatible': Budget(3, 300),
+    'products-by-category': Budget(2, 300),
+    'categories': Budget(2, 200),
+    # A file of a few rows: one batch of lookups, inserts, updates and index writes
+    'products-import': Budget(12, 500),
+    'async-categories': Budget(1, 300),
+    'async-products-by-category': Budget(1, 300),
+    # Plus the user's favorite IDs when the request carries a token
+    'async-product-detail': Budget(2, 200),
+    'api-root': Budget(1, 200),
+    'product-list': Budget(3, 300),
+    'product-detail': Budget(3, 200),
+    'favorite-list': Budget(2, 300),
+    'favorite-detail': Budget(2, 200),
+    'favorite-toggle-favorite': Budget(4, 300),
+    'favorite-favorites-list': Budget(3, 300),
+    # cart
+    'cart-items': Budget(1, 200),
+    'add-to-cart': Budget(7, 300),
+    'batch-update-cart': Budget(9, 300),
+    'remove-from-cart': Budget(2, 200),
+    # orders
+    'get-orders': Budget(2, 300),
+    # SQLite splits the product pair insert of the 50-item test cart in two
+    'create-order': Budget(14, 500),
+    'order-detail': Budget(2, 200),
+    'async-get-orders': Budget(2, 300),
+    'update-order-status': Budget(8, 300),
+    'order-events-ticket': Budget(0, 200),
+    # Events are streamed after the view returns; this covers opening the stream
+    'order-events': Budget(0, 200),
+    'sales-by-category': Budget(2, 200),
+    'top-products': Budget(2, 200),
+    'product-recommendations': Budget(3, 200),
+    'cart-recommendations': Budget(4, 200),
+    # Rows are streamed after the view returns; this covers setting up the response
+    'export-orders': Budget(1, 200),
+    # Django admin changelists, logged in through the session
+    'admin:orders_order_changelist': Budget(6, 500),
+    # The raw ID widgets look up one label per inline item (ITEMS_PER_ORDER)
+    'admin:orders_order_change': Budget(13, 500),
+    'admin:orders_orderitem_changelist': Budget(6, 500),
+    'admin:cart_cartitem_changelist': Budget(6, 500),
+    'admin:products_favorite_changelist': Budget(6, 500),
+}
+
+TIME_FACTOR = float(os.getenv('BUDGET_TIME_FACTOR', '1'))
+
+SEED_PRODUCTS = 2000
+SEED_USERS = 200
+FAVORITES_PER_USER = 10
+CART_ITEMS_PER_USER = 5
+ORDERS_PER_USER = 5
+ITEMS_PER_ORDER = 4
+
+DIETARY_INFO = [
+    'Vegan, gluten-free',
+    'Vegetarian',
+    'Halal',
+    'Contains pork',
+    'Keto friendly, dairy free',
+    'Pescatarian',
+    None,
+]
+CATEGORIES = ['AGAHAN', 'TANGHALIAN', 'HAPUNAN', 'MERIENDA']
+
+_timings = []
+
+
+def seed_data():
+    """Bulk-load a production-sized catalog with users, favorites, carts and orders."""
+    products = []
+    for i in range(SEED_PRODUCTS):
+        dietary_info = DIETARY_INFO[i % len(DIETARY_INFO)]
+        products.append(Product(
+            name=f'Dish {i}',
+            description=f'House special number {i} with rice',
+            price=Decimal(50 + i % 200),
+            category=CATEGORIES[i % len(CATEGORIES)],
+            ingredients='rice, garlic, egg' if i % 2 else 'chicken, soy sauce, vinegar',
+            dietary_info=dietary_info,
+            dietary_tags=parse_dietary_tags(dietary_info),
+        ))
+    products = Product.objects.bulk_create(products)
+    rebuild_index()
+
+    password = make_password('password123')
+    users = User.objects.bulk_create([
+        User(username=f'user{i}', email=f'user{i}@example.com', password=password)
+        for i in range(SEED_USERS)
+    ])
+
+    favorites, cart_items, orders = [], [], []
+    for i, user in enumerate(users):
+        for j in range(FAVORITES_PER_USER):
+            favorites.append(Favorite(user=user, product=products[(i * 7 + j) % SEED_PRODUCTS]))
+        for j in range(CART_ITEMS_PER_USER):
+            cart_items.append(CartItem(user=user, product=products[(i * 11 + j) % SEED_PRODUCTS], quantity=1 + j))
+        for _ in range(ORDERS_PER_USER):
+            orders.append(Order(user=user, status='Delivered'))
+    Favorite.objects.bulk_create(favorites)
+    CartItem.objects.bulk_create(cart_items)
+    orders = Order.objects.bulk_create(orders)
+
+    order_items = []
+    for i, order in enumerate(orders):
+        for j in range(ITEMS_PER_ORDER):
+            product = products[(i * 13 + j) % SEED_PRODUCTS]
+            order_items.append(OrderItem(
+                order=order, product=product, product_name=product.name,
+                quantity=1 + j, price=product.price,
+            ))
+    OrderItem.objects.bulk_create(order_items)
+    Order.objects.update_totals()
+
+    return users, products
+
+
+def _report_timings():
+    path = os.getenv('BUDGET_REPORT')
+    if not path or not _timings:
+        return
+    with open(path, 'w') as report:
+        json.dump(_timings, report, indent=2)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BudgetTestCase(TestCase):
+    """Seeds the dataset once per class and checks requests against ROUTE_BUDGETS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users, products = seed_data()
+        cls.user = users[0]
+        cls.other_user = users[1]
+        cls.products = products
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        _report_timings()
+
+    def setUp(self):
+        # Measure the cold path: no cached catalog pages, favorites or users
+        cache.clear()
+        user_cache.clear()
+        get_bucket_store().clear()
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token(user)}')
+        return client
+
+    def admin_client(self):
+        """Client for a superuser, logged in by both JWT (API) and session (Django admin)."""
+        admin = User.objects.create(
+            username='admin', email='admin@example.com', is_staff=True, is_superuser=True
+        )
+        client = self.client_for(admin)
+        client.force_login(admin)
+        return client
+
+    def access_token(self, user):
+        return str(AccessToken.for_user(user))
+
+    def _check(self, name, response, queries, elapsed, expected_status):
+        budget = ROUTE_BUDGETS[name]
+        elapsed_ms = elapsed * 1000
+        _timings.append({'route': name, 'queries': len(queries), 'ms': round(elapsed_ms, 2)})
+        if os.getenv('BUDGET_VERBOSE'):
+            sys.stderr.write(f'\n{name:<28} {len(queries):>3} queries {elapsed_ms:8.1f} ms')
+
+        body = b'<streaming>' if response.streaming else response.content[:500]
+        if expected_status is None:
+            self.assertLess(response.status_code, 400, f'{name}: {body}')
+        else:
+            self.assertEqual(response.status_code, expected_status, f'{name}: {body}')
+        self.assertLessEqual(
+            len(queries), budget.queries,
+            f'{name} ran {len(queries)} queries (budget {budget.queries}):\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
+        self.assertLessEqual(
+            elapsed_ms, budget.ms * TIME_FACTOR,
+            f'{name} took {elapsed_ms:.1f} ms (budget {budget.ms * TIME_FACTOR:.0f} ms)'
+        )
+        return response
+
+    def check_route(self, name, method='get', kwargs=None, query='', data=None,
+                    client=None, expected_status=None, **extra):
+        """Request a route and assert it stays within its query and time budget."""
+        client = client or self.client
+        url = reverse(name, kwargs=kwargs) + query
+        extra.setdefault('format', 'json')
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data, **extra)
+            elapsed = time.perf_counter() - start
+        return self._check(name, response, queries, elapsed, expected_status)
+
+    def check_async_route(self, name, method='get', kwargs=None, query='', headers=None, expected_status=None):
+        """check_route driven through the async test client, as the ASGI application serves it."""
+        url = reverse(name, kwargs=kwargs) + query
+        # The views' sync_to_async calls run back on this thread, so the
+        # queries land on the connection being captured here
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = async_to_sync(getattr(self.async_client, method))(url, headers=headers or {})
+            elapsed = time.perf_counter() - start
+        return self._check(name, response, queries, elapsed, expected_status)
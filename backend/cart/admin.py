@@ -1,8 +1,13 @@
 from django.contrib import admin
+from api.paginators import EstimatedCountPaginator
 from .models import CartItem
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
-    list_display = ('user', 'product', 'quantity')
+    list_display = ('user', 'product', 'quantity', 'added_at')
+    list_select_related = ('user', 'product')
     search_fields = ('product__name', 'user__username', 'user__email')
-    list_filter = ('user',)
\ No newline at end of file
+    date_hierarchy = 'added_at'
+    raw_id_fields = ('user', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
\ No newline at end of file
@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .models import CartItem
+
+
+def collapse_operations(operations):
+    """
+    Fold a list of cart operations into one final action per product.
+
+    Returns {product_id: ('set', quantity) | ('increment', delta)}. A set to 0
+    means the row is removed. Operations on the same product apply in order.
+    """
+    plan = {}
+    for operation in operations:
+        product_id = operation['product_id']
+        op = operation['op']
+        if op == 'remove':
+            plan[product_id] = ('set', 0)
+        elif op == 'set':
+            plan[product_id] = ('set', operation['quantity'])
+        else:
+            kind, current = plan.get(product_id, ('increment', 0))
+            plan[product_id] = (kind, current + operation.get('quantity', 1))
+    return plan
+
+
+def apply_cart_operations(user, operations):
+    """
+    Apply set/increment/remove operations to the user's cart atomically.
+
+    Uses a fixed number of statements whatever the number of operations:
+    one DELETE, one upsert for absolute quantities, and an insert-if-missing
+    plus a single database-side F() UPDATE for increments, so concurrent
+    increments of the same row never lose an update.
+    """
+    plan = collapse_operations(operations)
+    removes = [pid for pid, (kind, qty) in plan.items() if kind == 'set' and qty == 0]
+    sets = {pid: qty for pid, (kind, qty) in plan.items() if kind == 'set' and qty > 0}
+    increments = {pid: qty for pid, (kind, qty) in plan.items() if kind == 'increment'}
+
+    with transaction.atomic():
+        if removes:
+            CartItem.objects.filter(user=user, product_id__in=removes).delete()
+
+        if sets:
+            CartItem.objects.bulk_create(
+                [CartItem(user=user, product_id=pid, quantity=qty) for pid, qty in sets.items()],
+                update_conflicts=True,
+                unique_fields=['user', 'product'],
+                update_fields=['quantity'],
+            )
+
+        if increments:
+            # Make sure every row exists, then add the deltas on the database side
+            CartItem.objects.bulk_create(
+                [CartItem(user=user, product_id=pid, quantity=0) for pid in increments],
+                ignore_conflicts=True,
+            )
+            CartItem.objects.filter(user=user, product_id__in=increments).update(
+                quantity=F('quantity') + Case(
+                    *[When(product_id=pid, then=Value(delta)) for pid, delta in increments.items()],
+                    default=Value(0),
+                )
+            )
@@ -8,4 +8,23 @@ class CartItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'product_name', 'product_price', 'product_image', 'quantity']
\ No newline at end of file
+        fields = ['id', 'product', 'product_name', 'product_price', 'product_image', 'quantity']
+
+class CartOperationSerializer(serializers.Serializer):
+    OP_CHOICES = ['set', 'increment', 'remove']
+
+    op = serializers.ChoiceField(choices=OP_CHOICES)
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'set' and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': 'This field is required for set.'})
+        if attrs['op'] == 'increment' and attrs.get('quantity', 1) < 1:
+            raise serializers.ValidationError({'quantity': 'Increment must be at least 1.'})
+        return attrs
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(
+        child=CartOperationSerializer(), allow_empty=False, max_length=100
+    )
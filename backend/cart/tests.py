@@ -1,3 +1,31 @@
-from django.test import TestCase
+from backend.testing import BudgetTestCase
 
-# Create your tests here.
+
+class CartBudgetTests(BudgetTestCase):
+    def test_cart_items(self):
+        self.check_route('cart-items')
+
+    def test_add_to_cart(self):
+        self.check_route('add-to-cart', 'post', data={'product_id': self.products[0].pk, 'quantity': 2})
+
+    def test_batch_update_cart(self):
+        operations = [
+            {'op': 'increment', 'product_id': product.pk, 'quantity': 1}
+            for product in self.products[:20]
+        ] + [
+            {'op': 'set', 'product_id': product.pk, 'quantity': 3}
+            for product in self.products[20:40]
+        ] + [
+            {'op': 'remove', 'product_id': product.pk}
+            for product in self.products[40:60]
+        ]
+        response = self.check_route('batch-update-cart', 'post', data={'operations': operations})
+        self.assertGreaterEqual(len(response.json()), 40)
+
+    def test_remove_from_cart(self):
+        cart_item = self.user.cartitem_set.first()
+        self.check_route('remove-from-cart', 'delete',
+                         kwargs={'product_id': cart_item.product_id}, expected_status=204)
+
+    def test_cart_item_admin_changelist(self):
+        self.check_route('admin:cart_cartitem_changelist', client=self.admin_client())
@@ -1,41 +1,70 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .models import CartItem
-from .serializers import CartItemSerializer
+from .operations import apply_cart_operations
+from .serializers import CartBatchSerializer, CartItemSerializer, CartOperationSerializer
 from products.models import Product
+from api.authentication import TokenClaimsAuthentication
+from api.throttling import CartBatchThrottle, CartThrottle
 from django.shortcuts import get_object_or_404
 
 @api_view(['GET'])
+@authentication_classes([TokenClaimsAuthentication])
 @permission_classes([IsAuthenticated])
 def get_cart_items(request):
     """Fetch the logged-in user's cart items."""
-    cart_items = CartItem.objects.filter(user=request.user)
+    cart_items = CartItem.objects.filter(user_id=request.user.id).select_related('product')
     serializer = CartItemSerializer(cart_items, many=True)
     return Response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([CartThrottle])
 def add_to_cart(request):
     """Add a product to the logged-in user's cart or update quantity."""
-    product_id = request.data.get('product_id')
-    quantity = request.data.get('quantity', 1)  # Default quantity is 1
-    product = get_object_or_404(Product, id=product_id)
-    cart_item, created = CartItem.objects.get_or_create(
-        user=request.user, product=product,
-        defaults={'quantity': quantity}
-    )
-    if not created:
-        cart_item.quantity += quantity
-        cart_item.save()
+    operation = CartOperationSerializer(data={
+        'op': 'increment',
+        'product_id': request.data.get('product_id'),
+        'quantity': request.data.get('quantity', 1),  # Default quantity is 1
+    })
+    operation.is_valid(raise_exception=True)
+    product = get_object_or_404(Product, id=operation.validated_data['product_id'])
+    
+    apply_cart_operations(request.user, [operation.validated_data])
+    cart_item = CartItem.objects.select_related('product').get(user=request.user, product=product)
     serializer = CartItemSerializer(cart_item)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([CartBatchThrottle])
+def batch_update_cart(request):
+    """Apply a list of set/increment/remove operations and return the resulting cart."""
+    serializer = CartBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    operations = serializer.validated_data['operations']
+    
+    # Removing something that isn't there is a no-op, anything else needs a real product
+    product_ids = {op['product_id'] for op in operations if op['op'] != 'remove'}
+    found = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+    missing = sorted(product_ids - found)
+    if missing:
+        return Response(
+            {'error': 'Product not found', 'product_ids': missing},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    apply_cart_operations(request.user, operations)
+    cart_items = CartItem.objects.filter(user=request.user).select_related('product')
+    return Response(CartItemSerializer(cart_items, many=True).data)
+
 @api_view(['DELETE'])
+@authentication_classes([TokenClaimsAuthentication])
 @permission_classes([IsAuthenticated])
 def remove_from_cart(request, product_id):
     """Remove a product from the cart."""
-    cart_item = get_object_or_404(CartItem, user=request.user, product_id=product_id)
+    cart_item = get_object_or_404(CartItem, user_id=request.user.id, product_id=product_id)
     cart_item.delete()
-    return Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    return Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
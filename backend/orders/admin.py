@@ -1,14 +1,48 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from api.paginators import EstimatedCountPaginator
+from .models import DailyCategorySales, DailyProductSales, Order, OrderItem
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    raw_id_fields = ('product',)
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'status', 'created_at', 'total_amount')
-    search_fields = ('user__username', 'user__email', 'status')
-    list_filter = ('status', 'created_at')
+    list_display = ('id', 'user', 'status', 'created_at', 'order_total')
+    list_select_related = ('user',)
+    search_fields = ('=id', 'user__username', 'user__email')
+    list_filter = ('status',)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('user',)
+    inlines = (OrderItemInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.display(description='Total amount', ordering='_total_amount')
+    def order_total(self, obj):
+        return obj.total_amount
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ('id', 'order', 'product', 'quantity', 'price')
-    search_fields = ('order__id', 'product__name')
-    list_filter = ('order',)
\ No newline at end of file
+    list_display = ('id', 'order_id', 'product_name', 'quantity', 'price')
+    search_fields = ('=order__id', 'product_name')
+    date_hierarchy = 'order__created_at'
+    raw_id_fields = ('order', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'product', 'quantity', 'revenue')
+    list_select_related = ('product',)
+    raw_id_fields = ('product',)
+    date_hierarchy = 'date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(DailyCategorySales)
+class DailyCategorySalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'category', 'quantity', 'revenue')
+    list_filter = ('category',)
+    date_hierarchy = 'date'
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+
+from api.authentication import user_id_from_token
+from products.async_views import json_response
+from .serializers import OrderSerializer
+from .events import get_broker, redeem_stream_ticket
+from .views import order_history
+
+
+async def get_orders(request):
+    """Fetch all orders for the logged-in user."""
+    user_id = user_id_from_token(request)
+    if user_id is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=401
+        )
+
+    orders = [order async for order in order_history(user_id)]
+    return json_response(OrderSerializer(orders, many=True).data)
+
+
+# Comment lines keep proxies from closing an idle stream
+EVENT_STREAM_HEARTBEAT = 15
+# Streams end after this long; EventSource reconnects on its own
+EVENT_STREAM_MAX_AGE = 300
+EVENT_STREAM_RETRY_MS = 5000
+
+
+async def _order_event_stream(user_id):
+    subscription = get_broker().subscribe(user_id)
+    try:
+        yield f'retry: {EVENT_STREAM_RETRY_MS}\n\n'
+        deadline = time.monotonic() + EVENT_STREAM_MAX_AGE
+        while time.monotonic() < deadline:
+            event = await subscription.get(timeout=EVENT_STREAM_HEARTBEAT)
+            if event is None:
+                yield ': ping\n\n'
+            else:
+                yield f'event: order-status\ndata: {json.dumps(event)}\n\n'
+    finally:
+        # Also runs when the client disconnects and the response is cancelled
+        subscription.close()
+
+
+async def order_events(request):
+    """Server-sent events with the ID and new status of the user's orders as they change."""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would tie up a worker thread for its whole lifetime
+        return JsonResponse({'detail': 'Order events are only served by the ASGI application.'}, status=501)
+    # EventSource can't send headers; the client trades its access token for a ticket first
+    user_id = await redeem_stream_ticket(request.GET.get('ticket'))
+    if user_id is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=401
+        )
+
+    response = StreamingHttpResponse(_order_event_stream(user_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,279 @@
+"""
+Order status events for the server-sent events stream.
+
+Publishers call publish(user_id, event) from ordinary sync code; the SSE view
+subscribes per user and awaits events. Events have to reach streams served by
+any process (a web worker, the admin, a management command), so the broker is
+shared:
+
+* RedisBroker, the default when REDIS_URL is set, pushes events over Redis
+  pub/sub. Each process holds one subscription for all users and hands the
+  events to its own streams.
+* DatabaseBroker writes each event to the OrderEvent table, and every open
+  stream polls the table for its user's new rows. It needs no other service,
+  at the cost of a query per stream every EVENT_POLL_INTERVAL seconds; run
+  prune_order_events periodically to delete the rows read.
+* InProcessBroker only reaches subscribers in the same process.
+
+ORDER_EVENTS_BROKER takes the dotted path of any class with the same
+publish()/subscribe() interface.
+
+A browser's EventSource can't send an Authorization header, so a stream is
+opened with a ticket instead of the access token: issue_stream_ticket() hands
+out a random string that redeem_stream_ticket() accepts once, within
+STREAM_TICKET_TIMEOUT seconds. Tickets live in the shared cache.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OrderEvent
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+# DatabaseBroker streams poll at least this often; prune_order_events deletes
+# events older than EVENT_RETENTION, long after every stream has read them
+EVENT_POLL_INTERVAL = 2
+EVENT_RETENTION = timedelta(minutes=5)
+# Wait before resubscribing after the Redis connection drops
+REDIS_RECONNECT_DELAY = 1
+STREAM_TICKET_TIMEOUT = 30
+
+
+class Subscription:
+    """A subscriber's queue of events; iterate it with async for."""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = str(user_id)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Called from any thread; hand the event to the subscriber's event loop
+        def put():
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropped order event for user {self.user_id}: subscriber is not reading")
+
+        self.loop.call_soon_threadsafe(put)
+
+    async def get(self, timeout=None):
+        """Wait for the next event; returns None if the timeout passes first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Pub/sub between threads and event loops of a single process."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Start receiving the user's events. Must be called from a running event loop."""
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions[subscription.user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        """Send an event to every current subscriber of the user. Returns how many there were."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(str(user_id), ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+        return len(subscriptions)
+
+
+class DatabaseSubscription:
+    """A stream's view of the OrderEvent table: the user's events published since it started."""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.started_at = timezone.now()
+        self.last_id = None
+        self.pending = deque()
+
+    async def get(self, timeout=None):
+        """Wait for the next event; returns None if the timeout passes first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.pending:
+            await self._poll()
+            if self.pending:
+                break
+            wait = self.broker.poll_interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return None
+            await asyncio.sleep(wait)
+        return self.pending.popleft()
+
+    async def _poll(self):
+        events = OrderEvent.objects.filter(user_id=self.user_id).order_by('id')
+        if self.last_id is None:
+            events = events.filter(created_at__gte=self.started_at)
+        else:
+            events = events.filter(id__gt=self.last_id)
+        async for event_id, data in events.values_list('id', 'data'):
+            self.pending.append(data)
+            self.last_id = event_id
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class DatabaseBroker:
+    """Pub/sub through the OrderEvent table, across processes; see the module docstring."""
+
+    poll_interval = EVENT_POLL_INTERVAL
+
+    def subscribe(self, user_id):
+        return DatabaseSubscription(self, user_id)
+
+    def unsubscribe(self, subscription):
+        pass
+
+    def publish(self, user_id, event):
+        """Store an event for the user's streams. Their number isn't known here, so returns None."""
+        OrderEvent.objects.create(user_id=user_id, data=event)
+
+
+def prune_order_events(retention=EVENT_RETENTION, batch_size=1000):
+    """Delete events older than retention, batch_size rows per query. Returns how many were deleted."""
+    cutoff = timezone.now() - retention
+    deleted = 0
+    while True:
+        ids = list(
+            OrderEvent.objects.filter(created_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += OrderEvent.objects.filter(id__in=ids).delete()[0]
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Pub/sub over Redis, across processes; see the module docstring.
+
+    Events go out on one channel per user. The process's streams share a
+    single pattern subscription, started by the first subscribe() on an event
+    loop, which passes each event on to the matching local subscribers.
+    """
+
+    channel_prefix = 'order-events:'
+
+    def __init__(self, url=None):
+        super().__init__()
+        self.url = url or settings.REDIS_URL
+        self._client = None
+        self._listener = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        loop = asyncio.get_running_loop()
+        # A listener left on a loop that has since stopped is replaced
+        if self._listener is None or self._listener.done() or self._listener.get_loop() is not loop:
+            self._listener = loop.create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        import redis.asyncio as redis
+
+        while True:
+            client = redis.Redis.from_url(self.url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f'{self.channel_prefix}*')
+                async for message in pubsub.listen():
+                    if message['type'] != 'pmessage':
+                        continue
+                    user_id = message['channel'].decode().removeprefix(self.channel_prefix)
+                    super().publish(user_id, json.loads(message['data']))
+            except redis.ConnectionError:
+                logger.warning('Lost the order events subscription; resubscribing', exc_info=True)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+            await asyncio.sleep(REDIS_RECONNECT_DELAY)
+
+    def publish(self, user_id, event):
+        """Send an event to the user's streams in every process. Returns how many processes listen."""
+        return self.client.publish(f'{self.channel_prefix}{user_id}', json.dumps(event, cls=DjangoJSONEncoder))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'ORDER_EVENTS_BROKER', 'orders.events.DatabaseBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish_order_status(user_id, order_id, status):
+    """Push an order's new status to its owner's event streams."""
+    get_broker().publish(user_id, {'id': order_id, 'status': status})
+
+
+def _ticket_key(ticket):
+    return f'order-events-ticket:{ticket}'
+
+
+def issue_stream_ticket(user_id):
+    """Return a single-use ticket that opens the user's event stream."""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), user_id, STREAM_TICKET_TIMEOUT)
+    return ticket
+
+
+async def redeem_stream_ticket(ticket):
+    """Return the user ID a ticket was issued to, or None. A ticket is only accepted once."""
+    if not ticket:
+        return None
+    user_id = await cache.aget(_ticket_key(ticket))
+    # Of concurrent redemptions only one deletes the entry
+    if user_id is None or not await cache.adelete(_ticket_key(ticket)):
+        return None
+    return user_id
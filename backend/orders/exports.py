@@ -0,0 +1,121 @@
+"""
+Streaming order exports.
+
+Rows come from a single LEFT JOIN of orders and their items read with
+.iterator(), so memory use does not depend on how many orders are exported.
+CSV has one line per order item (an order without items gets one line with
+empty item columns); NDJSON has one JSON object per order with its items
+nested. Both rely on the rows arriving ordered by order id.
+
+Under ASGI the lines are handed over as an async iterator that reads the
+next few hundred lines in a worker thread per step; a plain generator would
+be collected into a list by Django before the first byte is sent.
+"""
+import csv
+import json
+from itertools import groupby, islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
+
+from .models import Order
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+LINES_PER_CHUNK = 500
+
+ORDER_FIELDS = ['order_id', 'user_id', 'user_email', 'status', 'created_at', 'total_amount']
+ITEM_FIELDS = ['item_id', 'product_id', 'product_name', 'quantity', 'price']
+
+_COLUMNS = [
+    'id', 'user_id', 'user__email', 'status', 'created_at', '_total_amount',
+    'items__id', 'items__product_id', 'items__product_name', 'items__quantity', 'items__price',
+]
+
+
+def parse_export_filters(start=None, end=None, status=None):
+    """
+    Validate the export filters. Dates are YYYY-MM-DD and inclusive; status is
+    a comma-separated list of Order statuses. Raises ValueError with a message
+    suitable for the client.
+    """
+    filters = {}
+    for name, value in (('start', start), ('end', end)):
+        if not value:
+            continue
+        try:
+            filters[name] = parse_date(value)
+        except ValueError:
+            filters[name] = None
+        if filters[name] is None:
+            raise ValueError(f'{name} must be a valid YYYY-MM-DD date')
+    if 'start' in filters and 'end' in filters and filters['start'] > filters['end']:
+        raise ValueError('start must not be after end')
+
+    if status:
+        statuses = [value.strip() for value in status.split(',') if value.strip()]
+        valid = dict(Order.STATUS_CHOICES)
+        unknown = [value for value in statuses if value not in valid]
+        if unknown:
+            raise ValueError(f'Unknown status: {", ".join(unknown)}')
+        filters['statuses'] = statuses
+    return filters
+
+
+def export_rows(start=None, end=None, statuses=None):
+    """Yield flat (order columns + item columns) tuples ordered by order and item id."""
+    orders = Order.objects.all()
+    if start:
+        orders = orders.filter(created_at__date__gte=start)
+    if end:
+        orders = orders.filter(created_at__date__lte=end)
+    if statuses:
+        orders = orders.filter(status__in=statuses)
+    return orders.order_by('id', 'items__id').values_list(*_COLUMNS).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo:
+    # csv.writer needs a file; this one hands each line straight back
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_FIELDS + ITEM_FIELDS)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def ndjson_lines(rows):
+    split = len(ORDER_FIELDS)
+    for order, order_rows in groupby(rows, key=lambda row: row[:split]):
+        data = dict(zip(ORDER_FIELDS, order))
+        data['items'] = [
+            dict(zip(ITEM_FIELDS, row[split:])) for row in order_rows if row[split] is not None
+        ]
+        yield json.dumps(data, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(export_format, **filters):
+    """Yield the export as text chunks in the given format."""
+    rows = export_rows(**filters)
+    if export_format == 'csv':
+        return csv_lines(rows)
+    return ndjson_lines(rows)
+
+
+def _next_chunk(lines):
+    return ''.join(islice(lines, LINES_PER_CHUNK))
+
+
+async def aexport_lines(export_format, **filters):
+    """export_lines for ASGI: yield LINES_PER_CHUNK lines at a time without blocking the event loop."""
+    lines = export_lines(export_format, **filters)
+    # Thread-sensitive, so every step advances the cursor on the same connection
+    while chunk := await sync_to_async(_next_chunk)(lines):
+        yield chunk
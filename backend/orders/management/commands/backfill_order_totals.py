@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored total of existing orders from their items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_id = 0
+        # Walk the table in primary key batches so each UPDATE stays short
+        while True:
+            ids = list(
+                Order.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            updated += Order.objects.filter(pk__in=ids).update_totals()
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} orders'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.exports import EXPORT_FORMATS, export_lines, parse_export_filters
+
+
+class Command(BaseCommand):
+    help = 'Stream orders and their items to a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='export_format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--start', help='First order date to include (YYYY-MM-DD).')
+        parser.add_argument('--end', help='Last order date to include (YYYY-MM-DD).')
+        parser.add_argument('--status', help='Comma-separated order statuses to include.')
+        parser.add_argument('--output', help='File to write. Defaults to stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_export_filters(options['start'], options['end'], options['status'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        lines = export_lines(options['export_format'], **filters)
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for line in lines:
+                output.write(line)
+        self.stderr.write(self.style.SUCCESS(f"Exported orders to {options['output']}"))
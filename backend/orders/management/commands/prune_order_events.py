@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from orders.events import EVENT_RETENTION, prune_order_events
+
+
+class Command(BaseCommand):
+    help = 'Delete order status events old enough that every event stream has read them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--retention', type=int, default=int(EVENT_RETENTION.total_seconds()),
+            help='Keep events younger than this many seconds',
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_order_events(timedelta(seconds=options['retention']), options['batch_size'])
+        self.stdout.write(f'Deleted {deleted} order events')
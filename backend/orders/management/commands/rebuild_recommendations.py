@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently ordered together" matrix from the order tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_recommendations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} product pair rows'))
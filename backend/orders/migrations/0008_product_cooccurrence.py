@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_created_idx'),
+        ('products', '0008_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCoOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.IntegerField(default=0)),
+                ('other_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_occurrences', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-order_count'], name='cooccurrence_product_idx')],
+                'unique_together': {('product', 'other_product')},
+            },
+        ),
+    ]
@@ -1,7 +1,25 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from products.models import Product
 
+class OrderQuerySet(models.QuerySet):
+    def update_totals(self):
+        """Recompute the stored total of every order in the queryset in one UPDATE."""
+        amount = models.DecimalField(max_digits=10, decimal_places=2)
+        item_totals = (
+            OrderItem.objects.filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(total=Sum(F('price') * F('quantity'), output_field=amount))
+            .values('total')[:1]
+        )
+        return self.update(
+            _total_amount=Coalesce(Subquery(item_totals), Value(Decimal('0.00')), output_field=amount)
+        )
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
@@ -10,6 +28,14 @@ class Order(models.Model):
         ('Delivered', 'Delivered'),
         ('Cancelled', 'Cancelled'),
     ]
+    # Status changes staff may make through the order status API
+    STATUS_TRANSITIONS = {
+        'Pending': ['Processing', 'Cancelled'],
+        'Processing': ['Shipped', 'Cancelled'],
+        'Shipped': ['Delivered'],
+        'Delivered': [],
+        'Cancelled': [],
+    }
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
@@ -22,23 +48,27 @@ class Order(models.Model):
         default=0.00, 
         verbose_name='Total Amount'
     )
+    # Client-supplied key so retried checkouts return the original order
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_order_idempotency_key'),
+        ]
+        indexes = [
+            # Order history: a user's orders, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Admin date hierarchy and date-range exports
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
 
     @property
     def total_amount(self):
-        # If _total_amount is 0, calculate from items
-        if self._total_amount == 0 and self.id:  # Ensure the order is saved
-            return sum(item.price * item.quantity for item in self.items.all())
+        # Kept up to date by create_order and the OrderItem signals in orders.signals
         return self._total_amount
 
-    def save(self, *args, **kwargs):
-        # Avoid calculating total_amount during initial save
-        if not self.id:  # If the order is being created
-            super().save(*args, **kwargs)  # Save the order first to generate a primary key
-        else:
-            # Calculate total_amount only if the order already exists
-            self._total_amount = sum(item.price * item.quantity for item in self.items.all())
-            super().save(*args, **kwargs)
-
     def __str__(self):
         return f"Order {self.id} - {self.user.username}"
 
@@ -47,6 +77,76 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Snapshot of the product name at order time
+    product_name = models.CharField(max_length=100, blank=True)
+
+    def save(self, *args, **kwargs):
+        if not self.product_name:
+            self.product_name = self.product.name
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+class DailyProductSales(models.Model):
+    # Rollup of non-cancelled order items per day and product, maintained by orders.rollups
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'product')
+        verbose_name_plural = 'daily product sales'
+
+    def __str__(self):
+        return f"{self.date} - {self.product_id}: {self.quantity}"
+
+
+class DailyCategorySales(models.Model):
+    # Rollup of non-cancelled order items per day and product category
+    date = models.DateField()
+    category = models.CharField(max_length=20, choices=Product.CATEGORY_CHOICES)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'category')
+        verbose_name_plural = 'daily category sales'
+
+    def __str__(self):
+        return f"{self.date} - {self.category}: {self.quantity}"
+
+
+class ProductCoOccurrence(models.Model):
+    # How many non-cancelled orders contain both products, maintained by orders.recommendations.
+    # Every pair is stored in both directions so a product's neighbours are one index range.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='co_occurrences')
+    other_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product', 'other_product')
+        indexes = [
+            models.Index(fields=['product', '-order_count'], name='cooccurrence_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_product_id}: {self.order_count}"
+
+
+class OrderEvent(models.Model):
+    # A status change waiting to be picked up by its owner's event streams, in
+    # whichever process serves them; written and read by orders.events.DatabaseBroker
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # A stream's poll: the user's events after the last one it saw
+            models.Index(fields=['user', 'id'], name='order_event_user_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name}"
\ No newline at end of file
+        return f"{self.user_id}: {self.data}"
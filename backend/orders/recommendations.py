@@ -0,0 +1,159 @@
+"""
+"Frequently ordered together" recommendations.
+
+ProductCoOccurrence is a sparse product x product matrix counting the
+non-cancelled orders that contain both products. create_order adds each new
+order's pairs and the Order signals take them out again on cancellation, like
+the sales rollups. Each product's strongest neighbours are cached as a tuple
+of (product_id, order_count) rows, so answering a request only merges a few
+short cached lists instead of aggregating order history. The
+rebuild_recommendations command recomputes the matrix from the order tables.
+"""
+import time
+from collections import Counter
+from functools import partial
+from itertools import combinations, groupby
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import OrderItem, ProductCoOccurrence
+
+# Only the first products of very large orders are paired, so one bulk order
+# can't write a quadratic number of rows
+MAX_PAIRED_PRODUCTS = 20
+# Neighbours kept per product; also the largest number of recommendations served
+MAX_NEIGHBOURS = 50
+
+NEIGHBOURS_VERSION_KEY = 'recommendations:version'
+NEIGHBOURS_CACHE_TIMEOUT = 60 * 60
+
+
+def _paired_products(product_ids):
+    return sorted(set(product_ids))[:MAX_PAIRED_PRODUCTS]
+
+
+def _version():
+    version = cache.get(NEIGHBOURS_VERSION_KEY)
+    if version is None:
+        # Seeded from the clock like the catalog version: if only this key is
+        # evicted, a restart from 1 would pick up neighbours cached long ago
+        cache.add(NEIGHBOURS_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(NEIGHBOURS_VERSION_KEY)
+    return version
+
+
+def _neighbours_key(version, product_id):
+    return f'recommendations:{version}:{product_id}'
+
+
+def invalidate_neighbours(product_ids):
+    version = _version()
+    cache.delete_many([_neighbours_key(version, product_id) for product_id in product_ids])
+
+
+def invalidate_all_neighbours():
+    try:
+        cache.incr(NEIGHBOURS_VERSION_KEY)
+    except ValueError:
+        _version()
+
+
+def record_order_pairs(product_ids, sign=1):
+    """Count the products of an order as ordered together, or uncount them with sign=-1."""
+    product_ids = _paired_products(product_ids)
+    if len(product_ids) < 2:
+        return
+
+    with transaction.atomic(savepoint=False):
+        # product_ids is sorted, so pairs are inserted and then locked in
+        # (product, other product) order and concurrent orders can't deadlock
+        ProductCoOccurrence.objects.bulk_create(
+            [
+                ProductCoOccurrence(product_id=product_id, other_product_id=other_id)
+                for product_id in product_ids for other_id in product_ids if product_id != other_id
+            ],
+            ignore_conflicts=True,
+        )
+        pairs = ProductCoOccurrence.objects.filter(product_id__in=product_ids, other_product_id__in=product_ids)
+        list(pairs.select_for_update().order_by('product_id', 'other_product_id').values_list('pk', flat=True))
+        # Every ordered pair among the products, in one UPDATE
+        pairs.update(order_count=F('order_count') + sign)
+    transaction.on_commit(partial(invalidate_neighbours, product_ids))
+
+
+def rebuild_recommendations(batch_size=1000):
+    """Recompute the co-occurrence matrix from the order tables. Returns the number of rows written."""
+    items = (
+        OrderItem.objects.exclude(order__status='Cancelled')
+        .order_by('order_id', 'product_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=batch_size)
+    )
+    counts = Counter()
+    for _, rows in groupby(items, key=lambda row: row[0]):
+        for pair in combinations(_paired_products(product_id for _, product_id in rows), 2):
+            counts[pair] += 1
+
+    with transaction.atomic():
+        ProductCoOccurrence.objects.all().delete()
+        rows = ProductCoOccurrence.objects.bulk_create(
+            sorted(
+                (
+                    ProductCoOccurrence(product_id=product_id, other_product_id=other_id, order_count=count)
+                    for (first, second), count in counts.items()
+                    for product_id, other_id in ((first, second), (second, first))
+                ),
+                key=lambda row: (row.product_id, row.other_product_id),
+            ),
+            batch_size=batch_size,
+        )
+    transaction.on_commit(invalidate_all_neighbours)
+    return len(rows)
+
+
+def get_neighbours(product_ids):
+    """Return {product_id: ((other_id, order_count), ...)} for the products, strongest first."""
+    version = _version()
+    keys = {product_id: _neighbours_key(version, product_id) for product_id in product_ids}
+    cached = cache.get_many(keys.values())
+    neighbours = {product_id: cached[key] for product_id, key in keys.items() if key in cached}
+
+    missing = [product_id for product_id in product_ids if product_id not in neighbours]
+    if missing:
+        rows = (
+            ProductCoOccurrence.objects.filter(product_id__in=missing, order_count__gt=0)
+            .annotate(rank=Window(
+                RowNumber(), partition_by=F('product_id'),
+                order_by=[F('order_count').desc(), F('other_product_id').asc()],
+            ))
+            .filter(rank__lte=MAX_NEIGHBOURS)
+            .order_by('product_id', 'rank')
+            .values_list('product_id', 'other_product_id', 'order_count')
+        )
+        loaded = {product_id: () for product_id in missing}
+        for product_id, group in groupby(rows, key=lambda row: row[0]):
+            loaded[product_id] = tuple((other_id, count) for _, other_id, count in group)
+        cache.set_many({keys[product_id]: value for product_id, value in loaded.items()},
+                       NEIGHBOURS_CACHE_TIMEOUT)
+        neighbours.update(loaded)
+    return neighbours
+
+
+def recommend(product_ids, limit=10):
+    """
+    Rank the products most often ordered together with the given ones.
+
+    Scores of products that go with several of the given products add up; the
+    given products themselves are never recommended. Returns up to ``limit``
+    (product_id, score) pairs, best first.
+    """
+    product_ids = set(product_ids)
+    scores = Counter()
+    for rows in get_neighbours(product_ids).values():
+        for other_id, count in rows:
+            if other_id not in product_ids:
+                scores[other_id] += count
+    return sorted(scores.items(), key=lambda row: (-row[1], row[0]))[:limit]
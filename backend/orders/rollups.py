@@ -0,0 +1,106 @@
+"""
+Daily sales rollups.
+
+DailyProductSales and DailyCategorySales hold per-day quantity and revenue of
+every order that is not cancelled, so reports read days x products rows
+instead of scanning OrderItem. create_order adds an order when it commits and
+the Order signals take it out again when it is cancelled (and back in if the
+cancellation is reverted). Edits made any other way, such as changing items
+by hand or QuerySet.update(), are fixed up with the rebuild_sales_rollups
+command.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailyProductSales, OrderItem
+
+_revenue = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _increment(model, key_field, date, totals, sign):
+    # Create missing rows, then add the deltas on the database side in one
+    # UPDATE. Rows are inserted and locked in key order, so concurrent orders
+    # sharing some products wait for each other instead of deadlocking
+    keys = sorted(totals)
+    model.objects.bulk_create([model(date=date, **{key_field: key}) for key in keys], ignore_conflicts=True)
+    rows = model.objects.filter(date=date, **{f'{key_field}__in': keys})
+    list(rows.select_for_update().order_by(key_field).values_list('pk', flat=True))
+    rows.update(
+        quantity=F('quantity') + Case(
+            *[When(**{key_field: key}, then=Value(sign * totals[key][0])) for key in keys],
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        revenue=F('revenue') + Case(
+            *[When(**{key_field: key}, then=Value(sign * totals[key][1])) for key in keys],
+            default=Value(Decimal('0')),
+            output_field=_revenue,
+        ),
+    )
+
+
+def record_order(order, items=None, sign=1):
+    """Add an order's items to the daily rollups, or take them out with sign=-1."""
+    if items is None:
+        items = order.items.select_related('product')
+
+    by_product = defaultdict(lambda: [0, Decimal('0')])
+    by_category = defaultdict(lambda: [0, Decimal('0')])
+    for item in items:
+        revenue = item.price * item.quantity
+        for totals, key in ((by_product, item.product_id), (by_category, item.product.category)):
+            totals[key][0] += item.quantity
+            totals[key][1] += revenue
+    if not by_product:
+        return
+
+    date = timezone.localdate(order.created_at)
+    with transaction.atomic(savepoint=False):
+        _increment(DailyProductSales, 'product_id', date, by_product, sign)
+        _increment(DailyCategorySales, 'category', date, by_category, sign)
+
+
+def rebuild_rollups(start=None, end=None, batch_size=1000):
+    """Recompute the rollups from the order tables for an optional date range. Returns the row counts."""
+    items = OrderItem.objects.exclude(order__status='Cancelled').annotate(date=TruncDate('order__created_at'))
+    product_rows = DailyProductSales.objects.all()
+    category_rows = DailyCategorySales.objects.all()
+    if start:
+        items = items.filter(date__gte=start)
+        product_rows = product_rows.filter(date__gte=start)
+        category_rows = category_rows.filter(date__gte=start)
+    if end:
+        items = items.filter(date__lte=end)
+        product_rows = product_rows.filter(date__lte=end)
+        category_rows = category_rows.filter(date__lte=end)
+
+    totals = {
+        'total_quantity': Sum('quantity'),
+        'total_revenue': Sum(F('price') * F('quantity'), output_field=_revenue),
+    }
+    with transaction.atomic():
+        product_rows.delete()
+        category_rows.delete()
+        products = DailyProductSales.objects.bulk_create(
+            [
+                DailyProductSales(date=row['date'], product_id=row['product_id'],
+                                  quantity=row['total_quantity'], revenue=row['total_revenue'])
+                for row in items.values('date', 'product_id').annotate(**totals).order_by('date', 'product_id')
+            ],
+            batch_size=batch_size,
+        )
+        categories = DailyCategorySales.objects.bulk_create(
+            [
+                DailyCategorySales(date=row['date'], category=row['product__category'],
+                                   quantity=row['total_quantity'], revenue=row['total_revenue'])
+                for row in items.values('date', 'product__category').annotate(**totals)
+                .order_by('date', 'product__category')
+            ],
+            batch_size=batch_size,
+        )
+    return len(products), len(categories)
@@ -1,16 +1,26 @@
 from rest_framework import serializers
-from .models import Order, OrderItem
+from .models import DailyCategorySales, Order, OrderItem
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_name = serializers.ReadOnlyField(source='product.name')
-    
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'product_name', 'quantity', 'price']
+        read_only_fields = ['product_name']
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     
     class Meta:
         model = Order
-        fields = ['id', 'status', 'created_at', 'total_amount', 'items']
\ No newline at end of file
+        fields = ['id', 'status', 'created_at', 'total_amount', 'items']
+
+class CategorySalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyCategorySales
+        fields = ['date', 'category', 'quantity', 'revenue']
+
+class ProductSalesSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    product_name = serializers.CharField(source='product__name')
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
@@ -0,0 +1,61 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Order, OrderItem
+from .events import publish_order_status
+from .recommendations import record_order_pairs
+from .rollups import record_order
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_total(sender, instance, raw=False, **kwargs):
+    # create_order bulk-inserts its items with the total already set, so this
+    # only runs for items edited one by one (admin, shell)
+    if raw:
+        return
+    Order.objects.filter(pk=instance.order_id).update_totals()
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_status(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_status = None
+    if raw or instance.pk is None or (update_fields is not None and 'status' not in update_fields):
+        return
+    instance._previous_status = (
+        Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollups(sender, instance, created, raw=False, **kwargs):
+    # New orders are added to the rollups by create_order itself
+    previous = getattr(instance, '_previous_status', None)
+    if raw or created or previous is None or previous == instance.status:
+        return
+    if instance.status == 'Cancelled':
+        record_order(instance, sign=-1)
+    elif previous == 'Cancelled':
+        record_order(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_recommendations(sender, instance, created, raw=False, **kwargs):
+    # Likewise, create_order counts the pairs of new orders
+    previous = getattr(instance, '_previous_status', None)
+    if raw or created or previous is None or previous == instance.status:
+        return
+    if instance.status == 'Cancelled' or previous == 'Cancelled':
+        product_ids = list(instance.items.values_list('product_id', flat=True))
+        record_order_pairs(product_ids, sign=-1 if instance.status == 'Cancelled' else 1)
+
+
+@receiver(post_save, sender=Order)
+def push_order_status(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if raw or created or previous is None or previous == instance.status:
+        return
+    transaction.on_commit(partial(publish_order_status, instance.user_id, instance.id, instance.status))
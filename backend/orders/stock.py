@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Now
+
+from products.cache import bump_catalog_version
+from products.models import Product
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_ids):
+        super().__init__(f'Not enough stock for products {product_ids}')
+        self.product_ids = product_ids
+
+
+def reserve_stock(quantities):
+    """
+    Take {product_id: quantity} out of stock. Must run inside the checkout transaction.
+
+    Each product gets one conditional UPDATE ... WHERE stock >= quantity, so
+    concurrent checkouts only wait on the rows of the products they share and
+    the database re-checks the condition after any wait: stock can't go
+    negative. Rows are updated in product ID order so two checkouts never
+    lock the same products in opposite orders. Raises OutOfStock listing every
+    product that ran short; the caller's transaction rolls back what was taken.
+    """
+    if not quantities:
+        return
+    short = []
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        reserved = Product.objects.filter(pk=product_id, stock__gte=quantity).update(
+            # Evaluated against the row before the update: the last portions sell out the product
+            available=Case(When(stock=quantity, then=Value(False)), default=F('available')),
+            stock=F('stock') - quantity,
+            updated_at=Now(),
+        )
+        if not reserved:
+            short.append(product_id)
+    if short:
+        raise OutOfStock(short)
+
+    # update() skips the Product signals; refresh cached catalog pages when something sold out
+    if Product.objects.filter(pk__in=list(quantities), stock=0).exists():
+        transaction.on_commit(bump_catalog_version)
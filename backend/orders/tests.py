@@ -1,3 +1,515 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection
+from django.db.models import Sum
+from django.test import TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import User
+from backend.testing import ITEMS_PER_ORDER, BudgetTestCase
+from cart.models import CartItem
+from products.cache import get_catalog_version
+from products.models import Product
+from .async_views import _order_event_stream
+from .events import DatabaseBroker, InProcessBroker, RedisBroker
+from .models import DailyCategorySales, DailyProductSales, Order, OrderEvent, OrderItem, ProductCoOccurrence
+from .recommendations import (
+    NEIGHBOURS_VERSION_KEY, _neighbours_key, _version, invalidate_all_neighbours, recommend,
+)
+from .stock import reserve_stock
+
+
+class OrdersBudgetTests(BudgetTestCase):
+    def test_get_orders(self):
+        response = self.check_route('get-orders')
+        self.assertEqual(len(response.json()), 5)
+
+    def test_create_order(self):
+        CartItem.objects.bulk_create([
+            CartItem(user=self.other_user, product=product, quantity=1)
+            for product in self.products[100:150]
+        ], ignore_conflicts=True)
+        self.check_route('create-order', 'post', data={},
+                         client=self.client_for(self.other_user), expected_status=201)
+
+    def test_integrity_error_without_idempotency_key_is_raised(self):
+        client = self.client_for(self.user)
+        with mock.patch('orders.views._checkout', side_effect=IntegrityError('unrelated')), \
+                self.assertRaises(IntegrityError):
+            client.post('/api/orders/create/', SERVER_NAME='localhost')
+
+    def test_order_detail(self):
+        order = self.user.orders.first()
+        self.check_route('order-detail', kwargs={'order_id': order.pk})
+
+    def test_async_get_orders(self):
+        token = self.access_token(self.user)
+        self.check_async_route('async-get-orders', headers={'Authorization': f'Bearer {token}'})
+
+
+class SalesRollupTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+
+    def checkout(self, user, products):
+        CartItem.objects.filter(user=user).delete()
+        CartItem.objects.bulk_create([CartItem(user=user, product=product, quantity=2) for product in products])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(user).post('/api/orders/create/', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(pk=response.json()['id'])
+
+    def rollup_rows(self):
+        return (
+            sorted(DailyProductSales.objects.values_list('date', 'product_id', 'quantity', 'revenue')),
+            sorted(DailyCategorySales.objects.values_list('date', 'category', 'quantity', 'revenue')),
+        )
+
+    def revenue(self):
+        return DailyCategorySales.objects.aggregate(total=Sum('revenue'))['total']
+
+    def test_checkout_and_cancellation_update_rollups(self):
+        before = self.revenue()
+        order = self.checkout(self.other_user, self.products[:3])
+        self.assertEqual(self.revenue(), before + order.total_amount)
+
+        order.status = 'Cancelled'
+        order.save()
+        self.assertEqual(self.revenue(), before)
+
+        order.status = 'Pending'
+        order.save()
+        self.assertEqual(self.revenue(), before + order.total_amount)
+
+    def test_rollups_are_updated_after_the_checkout_commits(self):
+        before = self.revenue()
+        CartItem.objects.filter(user=self.other_user).delete()
+        CartItem.objects.create(user=self.other_user, product=self.products[0], quantity=1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client_for(self.other_user).post('/api/orders/create/', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.revenue(), before)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.revenue(), before + self.products[0].price)
+
+    def test_rollup_failure_does_not_fail_the_checkout(self):
+        with mock.patch('orders.views.record_order', side_effect=DatabaseError('deadlock detected')), \
+                self.assertLogs('django', 'ERROR'):
+            order = self.checkout(self.other_user, self.products[:3])
+        self.assertFalse(CartItem.objects.filter(user=self.other_user).exists())
+        self.assertEqual(order.items.count(), 3)
+
+    def test_incremental_updates_match_rebuild(self):
+        self.checkout(self.user, self.products[10:15])
+        cancelled = self.checkout(self.other_user, self.products[12:20])
+        cancelled.status = 'Cancelled'
+        cancelled.save()
+        incremental = self.rollup_rows()
+
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_sales_by_category(self):
+        response = self.check_route('sales-by-category', client=self.admin_client())
+        self.assertTrue(response.json()['results'])
+
+    def test_top_products(self):
+        response = self.check_route('top-products', query='?order_by=quantity&limit=5',
+                                    client=self.admin_client())
+        results = response.json()['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results, sorted(results, key=lambda row: -row['quantity']))
+
+    def test_reports_are_admin_only(self):
+        self.check_route('top-products', expected_status=403)
+        self.check_route('sales-by-category', query='?start=2024-02-30',
+                         client=self.admin_client(), expected_status=400)
+
+
+class RecommendationTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        call_command('rebuild_recommendations', stdout=StringIO())
+
+    def checkout(self, user, products):
+        CartItem.objects.filter(user=user).delete()
+        CartItem.objects.bulk_create([CartItem(user=user, product=product, quantity=1) for product in products])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(user).post('/api/orders/create/', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(pk=response.json()['id'])
+
+    def pair_rows(self):
+        return sorted(
+            ProductCoOccurrence.objects.filter(order_count__gt=0)
+            .values_list('product_id', 'other_product_id', 'order_count')
+        )
+
+    def test_product_recommendations(self):
+        # The first seeded order holds the first ITEMS_PER_ORDER products
+        product = self.products[0]
+        response = self.check_route('product-recommendations', kwargs={'product_id': product.pk},
+                                    client=self.client_for(None))
+        result_ids = [row['id'] for row in response.json()['results']]
+        self.assertNotIn(product.pk, result_ids)
+        self.assertTrue({p.pk for p in self.products[1:ITEMS_PER_ORDER]} <= set(result_ids))
+
+    def test_cart_recommendations(self):
+        response = self.check_route('cart-recommendations', query='?limit=5')
+        results = response.json()['results']
+        cart_ids = set(CartItem.objects.filter(user=self.user).values_list('product_id', flat=True))
+        self.assertTrue(results)
+        self.assertLessEqual(len(results), 5)
+        self.assertFalse(cart_ids & {row['id'] for row in results})
+
+    def test_neighbours_are_served_from_cache(self):
+        product_ids = [p.pk for p in self.products[:5]]
+        expected = recommend(product_ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(recommend(product_ids), expected)
+
+    def test_lost_version_does_not_bring_back_old_neighbours(self):
+        product = self.products[0]
+        recommend([product.pk])
+        # The matrix changes on another worker, then the version key is evicted
+        stale = ((self.products[1999].pk, 99),)
+        cache.set(_neighbours_key(_version(), product.pk), stale)
+        invalidate_all_neighbours()
+        cache.delete(NEIGHBOURS_VERSION_KEY)
+        self.assertNotIn(99, dict(recommend([product.pk])).values())
+
+    def test_checkout_and_cancellation_update_pairs(self):
+        first, second = self.products[500], self.products[1501]
+        self.assertNotIn(second.pk, dict(recommend([first.pk])))
+
+        # Counted, and the cached neighbours dropped, once the order commits
+        order = self.checkout(self.other_user, [first, second])
+        self.assertEqual(dict(recommend([first.pk]))[second.pk], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'Cancelled'
+            order.save()
+        self.assertNotIn(second.pk, dict(recommend([first.pk])))
+
+    def test_pair_failure_does_not_fail_the_checkout(self):
+        with mock.patch('orders.views.record_order_pairs', side_effect=DatabaseError('deadlock detected')), \
+                self.assertLogs('django', 'ERROR'):
+            order = self.checkout(self.other_user, self.products[500:503])
+        self.assertEqual(order.items.count(), 3)
+
+    def test_incremental_updates_match_rebuild(self):
+        self.checkout(self.user, self.products[10:15])
+        cancelled = self.checkout(self.other_user, self.products[12:20])
+        cancelled.status = 'Cancelled'
+        cancelled.save()
+        self.checkout(self.other_user, self.products[14:18])
+        incremental = self.pair_rows()
+
+        call_command('rebuild_recommendations', stdout=StringIO())
+        self.assertEqual(self.pair_rows(), incremental)
+
+
+class OrderExportTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin_client = self.admin_client()
+        self.admin_token = self.access_token(User.objects.get(username='admin'))
+        Order.objects.filter(pk=self.user.orders.first().pk).update(status='Cancelled')
+
+    def test_csv_export(self):
+        response = self.check_route('export-orders', kwargs={'export_format': 'csv'}, client=self.admin_client)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), OrderItem.objects.count())
+        self.assertEqual(rows[0]['order_id'], str(Order.objects.order_by('id').first().id))
+
+    def test_ndjson_export_with_status_filter(self):
+        response = self.check_route('export-orders', kwargs={'export_format': 'ndjson'},
+                                    query='?status=Cancelled', client=self.admin_client)
+        orders = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(orders), 1)
+        self.assertEqual(orders[0]['status'], 'Cancelled')
+        self.assertEqual(len(orders[0]['items']), ITEMS_PER_ORDER)
+
+    @mock.patch('orders.exports.LINES_PER_CHUNK', 2)
+    async def test_export_streams_in_chunks_under_asgi(self):
+        response = await self.async_client.get(
+            reverse('export-orders', kwargs={'export_format': 'csv'}), headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertTrue(all(len(chunk.splitlines()) <= 2 for chunk in chunks))
+        rows = list(csv.DictReader(b''.join(chunks).decode().splitlines()))
+        self.assertEqual(len(rows), await OrderItem.objects.acount())
+        self.assertEqual(len(chunks), (len(rows) + 2) // 2)
+
+    def test_invalid_exports(self):
+        self.check_route('export-orders', kwargs={'export_format': 'xml'},
+                         client=self.admin_client, expected_status=400)
+        self.check_route('export-orders', kwargs={'export_format': 'csv'}, query='?status=Lost',
+                         client=self.admin_client, expected_status=400)
+        self.check_route('export-orders', kwargs={'export_format': 'csv'}, expected_status=403)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orders.ndjson')
+            call_command('export_orders', format='ndjson', end='2100-01-01', output=path, stderr=StringIO())
+            with open(path) as export:
+                self.assertEqual(sum(1 for _ in export), Order.objects.count())
+
+
+class OrderAdminBudgetTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = self.admin_client()
+
+    def test_order_changelist(self):
+        self.check_route('admin:orders_order_changelist')
+        self.check_route('admin:orders_order_changelist', query='?status__exact=Delivered&q=user1')
+
+    def test_order_change(self):
+        self.check_route('admin:orders_order_change', kwargs={'object_id': self.user.orders.first().pk})
+
+    def test_order_item_changelist(self):
+        self.check_route('admin:orders_orderitem_changelist')
+
+
+class OrderStatusEventTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.user.orders.first()
+        Order.objects.filter(pk=self.order.pk).update(status='Pending')
+        self.admin_client = self.admin_client()
+
+    def change_status(self, new_status, expected_status=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.check_route('update-order-status', 'post', kwargs={'order_id': self.order.pk},
+                                    data={'status': new_status}, client=self.admin_client,
+                                    expected_status=expected_status)
+
+    def test_update_order_status(self):
+        response = self.change_status('Processing')
+        self.assertEqual(response.json(), {'id': self.order.pk, 'status': 'Processing'})
+
+    def test_invalid_transition(self):
+        response = self.change_status('Delivered', expected_status=400)
+        self.assertEqual(response.json()['allowed'], ['Processing', 'Cancelled'])
+        self.check_route('update-order-status', 'post', kwargs={'order_id': self.order.pk},
+                         data={'status': 'Processing'}, expected_status=403)
+
+    def ticket(self):
+        response = self.check_async_route(
+            'order-events-ticket', 'post', headers={'Authorization': f'Bearer {self.access_token(self.user)}'},
+            expected_status=201,
+        )
+        return json.loads(response.content)['ticket']
+
+    def test_order_events_route(self):
+        ticket = self.ticket()
+        response = self.check_async_route('order-events', query=f'?ticket={ticket}')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        # A ticket opens one stream, and the access token is no substitute
+        self.check_async_route('order-events', query=f'?ticket={ticket}', expected_status=401)
+        self.check_async_route('order-events', query=f'?token={self.access_token(self.user)}',
+                               expected_status=401)
+        self.check_async_route('order-events-ticket', 'post', expected_status=401)
+        # Under WSGI there is no stream to open, and the client should stop asking
+        self.check_route('order-events-ticket', 'post', expected_status=501)
+
+    @mock.patch.object(DatabaseBroker, 'poll_interval', 0.05)
+    async def test_status_change_is_pushed_to_owner(self):
+        ticket = await sync_to_async(self.ticket)()
+        response = await self.async_client.get(f'/api/async/orders/events/?ticket={ticket}')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        # Published through the OrderEvent table, as from another process
+        await sync_to_async(self.change_status)('Processing')
+        event = await asyncio.wait_for(anext(stream), timeout=5)
+        self.assertEqual(
+            event.decode(),
+            f'event: order-status\ndata: {{"id": {self.order.pk}, "status": "Processing"}}\n\n',
+        )
+
+    def test_old_events_are_pruned(self):
+        broker = DatabaseBroker()
+        for status in ('Processing', 'Shipped'):
+            broker.publish(self.user.pk, {'id': 1, 'status': status})
+        OrderEvent.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        broker.publish(self.user.pk, {'id': 1, 'status': 'Delivered'})
+        # Publishing leaves the table alone; the periodic command does the deleting
+        self.assertEqual(OrderEvent.objects.count(), 3)
+
+        out = StringIO()
+        call_command('prune_order_events', batch_size=1, stdout=out)
+        self.assertEqual(out.getvalue(), 'Deleted 2 order events\n')
+        self.assertEqual(list(OrderEvent.objects.values_list('data', flat=True)), [{'id': 1, 'status': 'Delivered'}])
+
+    @skipUnless(os.getenv('TEST_REDIS_URL'), 'TEST_REDIS_URL is not set')
+    async def test_redis_broker_pushes_across_processes(self):
+        # Separate brokers stand in for the publishing and the streaming process
+        publisher = RedisBroker(os.environ['TEST_REDIS_URL'])
+        broker = RedisBroker(os.environ['TEST_REDIS_URL'])
+        subscription = broker.subscribe(self.user.pk)
+        try:
+            for _ in range(50):
+                if await sync_to_async(publisher.publish)(self.user.pk, {'id': 1, 'status': 'Shipped'}):
+                    break
+                # The subscription is still being set up
+                await asyncio.sleep(0.05)
+            self.assertEqual(await subscription.get(timeout=5), {'id': 1, 'status': 'Shipped'})
+        finally:
+            subscription.close()
+            broker._listener.cancel()
+
+    async def test_closed_stream_unsubscribes(self):
+        broker = InProcessBroker()
+        with mock.patch('orders.async_views.get_broker', return_value=broker):
+            stream = _order_event_stream(self.user.pk)
+            await anext(stream)
+            self.assertEqual(broker.publish(self.user.pk, {'id': 1, 'status': 'Shipped'}), 1)
+            await stream.aclose()
+            self.assertEqual(broker.publish(self.user.pk, {'id': 1, 'status': 'Shipped'}), 0)
+
+
+class StockReservationTests(BudgetTestCase):
+    def set_cart(self, user, quantities):
+        CartItem.objects.filter(user=user).delete()
+        CartItem.objects.bulk_create([
+            CartItem(user=user, product=product, quantity=quantity) for product, quantity in quantities
+        ])
+
+    def checkout(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client_for(user).post('/api/orders/create/', SERVER_NAME='localhost')
+
+    def test_checkout_sells_out_product(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock=3)
+        self.set_cart(self.user, [(product, 3)])
+        version = get_catalog_version()
+
+        self.assertEqual(self.checkout(self.user).status_code, 201)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertFalse(product.available)
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_restocking_puts_sold_out_product_back_on_sale(self):
+        sold_out, hidden = self.products[:2]
+        Product.objects.filter(pk=sold_out.pk).update(stock=1)
+        Product.objects.filter(pk=hidden.pk).update(stock=1, available=False)
+        self.set_cart(self.user, [(sold_out, 1)])
+        self.assertEqual(self.checkout(self.user).status_code, 201)
+
+        for product in Product.objects.filter(pk__in=[sold_out.pk, hidden.pk]):
+            product.stock = 10
+            product.save(update_fields=['stock'])
+        # A product hidden by hand stays hidden
+        self.assertEqual(
+            dict(Product.objects.filter(pk__in=[sold_out.pk, hidden.pk]).values_list('pk', 'available')),
+            {sold_out.pk: True, hidden.pk: False},
+        )
+
+    def test_short_stock_rolls_back_checkout(self):
+        scarce, plenty, untracked = self.products[:3]
+        Product.objects.filter(pk=scarce.pk).update(stock=1)
+        Product.objects.filter(pk=plenty.pk).update(stock=5)
+        self.set_cart(self.user, [(scarce, 2), (plenty, 1), (untracked, 4)])
+        orders = Order.objects.count()
+
+        response = self.checkout(self.user)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['product_ids'], [scarce.pk])
+        self.assertEqual(Order.objects.count(), orders)
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            dict(Product.objects.filter(pk__in=[scarce.pk, plenty.pk]).values_list('pk', 'stock')),
+            {scarce.pk: 1, plenty.pk: 5},
+        )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class StockConcurrencyTests(TransactionTestCase):
+    """Checkouts racing from many threads, each on its own database connection."""
+
+    THREADS = 16
+    STOCK = 5
+
+    def setUp(self):
+        self.popular = Product.objects.create(name='Adobo', price=Decimal('120.00'), stock=self.STOCK)
+        self.other = Product.objects.create(name='Sinigang', price=Decimal('150.00'), stock=100)
+        self.users = User.objects.bulk_create([
+            User(username=f'diner{i}', email=f'diner{i}@example.com') for i in range(self.THREADS)
+        ])
+
+    def checkout(self, user):
+        client = APIClient(SERVER_NAME='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        try:
+            return client.post('/api/orders/create/').status_code
+        finally:
+            connection.close()
+
+    def test_popular_product_is_never_oversold(self):
+        CartItem.objects.bulk_create([CartItem(user=user, product=self.popular, quantity=1) for user in self.users])
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            statuses = list(pool.map(self.checkout, self.users))
+
+        self.popular.refresh_from_db()
+        sold = OrderItem.objects.filter(product=self.popular).aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(sold, self.STOCK)
+        self.assertEqual(statuses.count(201), self.STOCK)
+        self.assertEqual(statuses.count(409), self.THREADS - self.STOCK)
+        self.assertEqual(self.popular.stock, 0)
+        self.assertFalse(self.popular.available)
+
+    # SQLite locks the whole database for a write, so this needs a database
+    # with row locks; CI runs the suite on PostgreSQL
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_reservation_does_not_block_other_products(self):
+        holder, other_buyer = self.users[:2]
+        # Different categories, so the rollup updates run after each commit touch different rows too
+        Product.objects.filter(pk=self.popular.pk).update(category='AGAHAN')
+        Product.objects.filter(pk=self.other.pk).update(category='HAPUNAN')
+        CartItem.objects.create(user=holder, product=self.popular, quantity=1)
+        CartItem.objects.create(user=other_buyer, product=self.other, quantity=1)
+
+        reserved = threading.Event()
+        release = threading.Event()
+
+        def slow_reserve_stock(quantities):
+            reserve_stock(quantities)
+            # Hold the first checkout open after its last write, with every lock it takes
+            if self.popular.pk in quantities:
+                reserved.set()
+                release.wait(10)
+
+        with mock.patch('orders.views.reserve_stock', slow_reserve_stock), ThreadPoolExecutor(2) as pool:
+            held = pool.submit(self.checkout, holder)
+            self.assertTrue(reserved.wait(10))
+            # Completes while the other checkout still holds its locks
+            self.assertEqual(pool.submit(self.checkout, other_buyer).result(timeout=10), 201)
+            release.set()
+            self.assertEqual(held.result(timeout=10), 201)
+        self.assertEqual(DailyCategorySales.objects.filter(category__in=['AGAHAN', 'HAPUNAN']).count(), 2)
@@ -1,8 +1,17 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('orders/', views.get_orders, name='get-orders'),
     path('orders/create/', views.create_order, name='create-order'),
     path('orders/<int:order_id>/', views.get_order_detail, name='order-detail'),
+    path('orders/<int:order_id>/status/', views.update_order_status, name='update-order-status'),
+    path('async/orders/', async_views.get_orders, name='async-get-orders'),
+    path('orders/events/ticket/', views.order_events_ticket, name='order-events-ticket'),
+    path('async/orders/events/', async_views.order_events, name='order-events'),
+    path('reports/sales/categories/', views.sales_by_category, name='sales-by-category'),
+    path('reports/sales/products/', views.top_products, name='top-products'),
+    path('recommendations/products/<int:product_id>/', views.product_recommendations, name='product-recommendations'),
+    path('recommendations/cart/', views.cart_recommendations, name='cart-recommendations'),
+    path('exports/orders.<str:export_format>', views.export_orders, name='export-orders'),
 ]
\ No newline at end of file
@@ -1,69 +1,291 @@
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from rest_framework import status
-from .models import Order, OrderItem
-from .serializers import OrderSerializer
-from django.shortcuts import get_object_or_404
-from cart.models import CartItem
+from datetime import timedelta
 
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from rest_framework import status
-from .models import Order, OrderItem
-from .serializers import OrderSerializer
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from api.authentication import TokenClaimsAuthentication
+from api.throttling import CheckoutThrottle
 from cart.models import CartItem
+from products.models import Product
+from products.serializers import ProductSerializer
+from .events import issue_stream_ticket
+from .exports import EXPORT_FORMATS, aexport_lines, export_lines, parse_export_filters
+from .models import DailyCategorySales, DailyProductSales, Order, OrderItem
+from .recommendations import MAX_NEIGHBOURS, recommend, record_order_pairs
+from .rollups import record_order
+from .serializers import CategorySalesSerializer, OrderSerializer, ProductSalesSerializer
+from .stock import OutOfStock, reserve_stock
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+def _get_idempotency_key(request):
+    return request.headers.get('Idempotency-Key') or request.data.get('idempotency_key') or None
+
+def _checkout(user, idempotency_key):
+    """Turn the user's cart into an order. Returns (order, created)."""
+    with transaction.atomic():
+        # Lock the cart rows so concurrent checkouts of the same cart run one at a time
+        cart_items = list(
+            CartItem.objects.select_for_update(of=('self',))
+            .filter(user=user)
+            .select_related('product')
+        )
+        
+        # A retry of a checkout that already went through returns the original order
+        if idempotency_key:
+            existing = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+            if existing:
+                return existing, False
+        
+        if not cart_items:
+            return None, False
+        
+        order = Order.objects.create(
+            user=user,
+            status='Pending',
+            idempotency_key=idempotency_key,
+            _total_amount=sum(item.product.price * item.quantity for item in cart_items),
+        )
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=cart_item.product,
+                quantity=cart_item.quantity,
+                price=cart_item.product.price,
+                product_name=cart_item.product.name
+            )
+            for cart_item in cart_items
+        ])
+        
+        # Clear the user's cart
+        CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+        
+        # Reserve stock last so the hot product rows stay locked only until commit
+        reserve_stock({
+            item.product_id: item.quantity for item in cart_items if item.product.stock is not None
+        })
+        # The rollup and pair counts are shared rows every checkout writes; update
+        # them after the commit so checkouts don't queue on their locks. By then
+        # the order stands, so a failure is only logged; rebuild_sales_rollups
+        # and rebuild_recommendations repair the counts
+        transaction.on_commit(lambda: record_order(order, items), robust=True)
+        product_ids = [item.product_id for item in items]
+        transaction.on_commit(lambda: record_order_pairs(product_ids), robust=True)
+    
+    # Serialize from the rows we just wrote instead of reading them back
+    order._prefetched_objects_cache = {'items': items}
+    return order, True
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([CheckoutThrottle])
 def create_order(request):
-    # Get user's cart items
-    cart_items = CartItem.objects.filter(user=request.user)
-    
-    if not cart_items.exists():
+    """Place an order for everything in the user's cart."""
+    idempotency_key = _get_idempotency_key(request)
+    if idempotency_key and len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
         return Response(
-            {'error': 'Your cart is empty'}, 
+            {'error': f'Idempotency key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Create the order and save it to the database
-    order = Order(user=request.user, status='Pending')
-    order.save()  # Save the order to generate a primary key
-    
-    # Create order items from cart items
-    for cart_item in cart_items:
-        OrderItem.objects.create(
-            order=order,  # Now the order has a primary key
-            product=cart_item.product,
-            quantity=cart_item.quantity,
-            price=cart_item.product.price
+    try:
+        order, created = _checkout(request.user, idempotency_key)
+    except IntegrityError:
+        if not idempotency_key:
+            raise
+        # A concurrent retry with the same key won the race
+        order = get_object_or_404(Order, user=request.user, idempotency_key=idempotency_key)
+        created = False
+    except OutOfStock as e:
+        return Response(
+            {'error': 'Some items in your cart are out of stock', 'product_ids': e.product_ids},
+            status=status.HTTP_409_CONFLICT
         )
     
-    # Clear the user's cart
-    cart_items.delete()
-    
-    # Calculate and update the total_amount for the order
-    order._total_amount = sum(item.price * item.quantity for item in order.items.all())
-    order.save()  # Save the order again to update the total_amount
+    if order is None:
+        return Response(
+            {'error': 'Your cart is empty'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Return the created order
     serializer = OrderSerializer(order)
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+    return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+def order_history(user_id):
+    return Order.objects.filter(user_id=user_id).order_by('-created_at').prefetch_related('items')
 
 @api_view(['GET'])
+@authentication_classes([TokenClaimsAuthentication])
 @permission_classes([IsAuthenticated])
 def get_orders(request):
     """Fetch all orders for the logged-in user."""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = order_history(request.user.id)
     serializer = OrderSerializer(orders, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
+@authentication_classes([TokenClaimsAuthentication])
 @permission_classes([IsAuthenticated])
 def get_order_detail(request, order_id):
     """Fetch details of a specific order."""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(Order.objects.prefetch_related('items'), id=order_id, user_id=request.user.id)
     serializer = OrderSerializer(order)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def update_order_status(request, order_id):
+    """Move an order to its next status; the owner is notified over the order event stream."""
+    new_status = request.data.get('status')
+    with transaction.atomic():
+        order = get_object_or_404(Order.objects.select_for_update(), id=order_id)
+        allowed = Order.STATUS_TRANSITIONS.get(order.status, [])
+        if new_status not in allowed:
+            return Response(
+                {'error': f'Cannot change status from {order.status} to {new_status}', 'allowed': allowed},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        order.status = new_status
+        order.save(update_fields=['status'])
+    
+    return Response({'id': order.id, 'status': order.status})
+
+@api_view(['POST'])
+@authentication_classes([TokenClaimsAuthentication])
+@permission_classes([IsAuthenticated])
+def order_events_ticket(request):
+    """Issue a short-lived, single-use ticket that opens the user's order event stream."""
+    if not isinstance(request._request, ASGIRequest):
+        # Only the ASGI application serves the stream; tell the client not to keep trying
+        return Response(
+            {'error': 'Order events are only served by the ASGI application.'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    return Response({'ticket': issue_stream_ticket(request.user.id)}, status=status.HTTP_201_CREATED)
+
+REPORT_DEFAULT_DAYS = 7
+REPORT_MAX_DAYS = 366
+TOP_PRODUCTS_LIMIT = 10
+
+def _report_range(request):
+    """Parse ?start=&end= (YYYY-MM-DD, inclusive). Returns (start, end, error)."""
+    end = request.query_params.get('end')
+    start = request.query_params.get('start')
+    try:
+        end = parse_date(end) if end else timezone.localdate()
+        start = parse_date(start) if start else end - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        return None, None, 'Dates must be in YYYY-MM-DD format'
+    if start > end:
+        return None, None, 'start must not be after end'
+    if (end - start).days >= REPORT_MAX_DAYS:
+        return None, None, f'Reports cover at most {REPORT_MAX_DAYS} days'
+    return start, end, None
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_by_category(request):
+    """Daily quantity and revenue per category, read from the sales rollups."""
+    start, end, error = _report_range(request)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = DailyCategorySales.objects.filter(date__range=(start, end)).order_by('date', 'category')
+    return Response({
+        'start': start,
+        'end': end,
+        'results': CategorySalesSerializer(rows, many=True).data,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def top_products(request):
+    """Best-selling products over a date range, read from the sales rollups."""
+    start, end, error = _report_range(request)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    
+    order_by = request.query_params.get('order_by', 'revenue')
+    if order_by not in ('revenue', 'quantity'):
+        return Response({'error': 'order_by must be revenue or quantity'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', TOP_PRODUCTS_LIMIT)), 1), 100)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = (
+        DailyProductSales.objects.filter(date__range=(start, end))
+        .values('product_id', 'product__name')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by(f'-{order_by}', 'product_id')[:limit]
+    )
+    return Response({
+        'start': start,
+        'end': end,
+        'results': ProductSalesSerializer(rows, many=True).data,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_orders(request, export_format):
+    """Stream orders and their items as CSV or NDJSON."""
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {'error': f'Format must be one of: {", ".join(EXPORT_FORMATS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        filters = parse_export_filters(
+            start=request.query_params.get('start'),
+            end=request.query_params.get('end'),
+            status=request.query_params.get('status'),
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if isinstance(request._request, ASGIRequest):
+        lines = aexport_lines(export_format, **filters)
+    else:
+        lines = export_lines(export_format, **filters)
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    filename = f"orders-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+RECOMMENDATIONS_LIMIT = 10
+
+def _recommendations_response(request, product_ids):
+    try:
+        limit = min(max(int(request.query_params.get('limit', RECOMMENDATIONS_LIMIT)), 1), MAX_NEIGHBOURS)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Rank from the precomputed neighbours, then load the best available products in one query
+    ranked = [product_id for product_id, _ in recommend(product_ids, MAX_NEIGHBOURS)]
+    products = Product.objects.filter(available=True).in_bulk(ranked)
+    results = [products[product_id] for product_id in ranked if product_id in products][:limit]
+    return Response({'results': ProductSerializer(results, many=True).data})
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def product_recommendations(request, product_id):
+    """Products most often ordered together with a product."""
+    return _recommendations_response(request, [product_id])
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cart_recommendations(request):
+    """Products most often ordered together with what is in the user's cart."""
+    product_ids = CartItem.objects.filter(user=request.user).values_list('product_id', flat=True)
+    return _recommendations_response(request, list(product_ids))
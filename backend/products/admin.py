@@ -1,14 +1,15 @@
 from django.contrib import admin
+from api.paginators import EstimatedCountPaginator
 from .models import Product,Favorite
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'available', 'category')
-    search_fields = ('name',)
+    list_display = ('name', 'sku', 'price', 'available', 'stock', 'category')
+    search_fields = ('name', '=sku')
     list_filter = ('available', 'category')
     fieldsets = (
         (None, {
-            'fields': ('name', 'description', 'price', 'image_url', 'available', 'category')
+            'fields': ('name', 'sku', 'description', 'price', 'image_url', 'available', 'stock', 'category')
         }),
         ('Additional Information', {
             'fields': ('ingredients', 'serving_size', 'dietary_info')
@@ -17,5 +18,9 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'product', 'created_at')
+    list_select_related = ('user', 'product')
     search_fields = ('user__username', 'product__name')
-    list_filter = ('created_at',)
\ No newline at end of file
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('user', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
\ No newline at end of file
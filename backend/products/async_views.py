@@ -0,0 +1,87 @@
+"""
+Async variants of the hot catalog reads, served natively under ASGI.
+
+They return the same payloads as the DRF views in products.views but use
+Django's async ORM, so a single ASGI worker can keep many requests in
+flight while they wait on the database.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from rest_framework.renderers import JSONRenderer
+
+from api.authentication import user_id_from_token
+from .cache import get_favorite_product_ids_by_user_id
+from .models import Product
+from .pagination import CatalogCursorPagination, after_position, decode_position, encode_position
+from .serializers import ProductSerializer, ProductWithFavoriteSerializer
+from .views import build_categories, category_products, used_categories
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def _page_size(request):
+    try:
+        page_size = int(request.GET.get('page_size', settings.CATALOG_PAGE_SIZE))
+    except ValueError:
+        page_size = settings.CATALOG_PAGE_SIZE
+    return max(1, min(page_size, CatalogCursorPagination.max_page_size))
+
+
+def _is_legacy(request):
+    if getattr(settings, 'LEGACY_LIST_RESPONSES', False):
+        return True
+    return request.GET.get('legacy', '').lower() in ('1', 'true', 'yes')
+
+
+async def get_categories(request):
+    """Get all available product categories."""
+    categories = [category async for category in used_categories()]
+    return json_response(build_categories(categories))
+
+
+async def get_products_by_category(request, category):
+    """Fetch products filtered by category, keyset-paginated over (created_at, id)."""
+    products = category_products(category).order_by('created_at', 'id')
+
+    if _is_legacy(request):
+        return json_response(ProductSerializer([p async for p in products], many=True).data)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            products = after_position(products, *decode_position(cursor))
+        except ValueError:
+            return JsonResponse({'detail': 'Invalid cursor.'}, status=404)
+
+    page_size = _page_size(request)
+    page = [p async for p in products[:page_size + 1]]
+
+    next_url = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        params = request.GET.copy()
+        params['cursor'] = encode_position(page[-1])
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+    return json_response({
+        'next': next_url,
+        'previous': None,
+        'results': ProductSerializer(page, many=True).data,
+    })
+
+
+async def get_product_detail(request, pk):
+    """Fetch a single product, with is_favorite for the signed-in user."""
+    try:
+        product = await Product.objects.aget(pk=pk)
+    except Product.DoesNotExist:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    user_id = user_id_from_token(request)
+    favorite_ids = frozenset()
+    if user_id is not None:
+        favorite_ids = await sync_to_async(get_favorite_product_ids_by_user_id)(user_id)
+    return json_response(ProductWithFavoriteSerializer(product, context={'favorite_ids': favorite_ids}).data)
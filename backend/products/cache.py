@@ -0,0 +1,193 @@
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .models import Favorite, Product
+
+FAVORITES_CACHE_TIMEOUT = 60 * 10
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+# How long a rebuild may hold the lock, and how long other requests wait on it
+CATALOG_REBUILD_LOCK_TIMEOUT = 10
+CATALOG_REBUILD_WAIT = 5
+CATALOG_REBUILD_POLL_INTERVAL = 0.05
+
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def favorites_cache_key(user_id):
+    return f'favorites:{user_id}'
+
+
+def get_favorite_product_ids(user):
+    """Return the set of product IDs the user has favorited, cached per user."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    return get_favorite_product_ids_by_user_id(user.pk)
+
+
+def get_favorite_product_ids_by_user_id(user_id):
+    """get_favorite_product_ids() for callers that only have the user's ID."""
+    key = favorites_cache_key(user_id)
+    product_ids = cache.get(key)
+    if product_ids is None:
+        product_ids = frozenset(
+            Favorite.objects.filter(user_id=user_id).values_list('product_id', flat=True)
+        )
+        cache.set(key, product_ids, FAVORITES_CACHE_TIMEOUT)
+    return product_ids
+
+
+def invalidate_favorite_product_ids(user_id):
+    cache.delete(favorites_cache_key(user_id))
+
+
+def get_catalog_version():
+    """Return the current catalog version; every catalog cache key embeds it."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a flushed cache never reuses an old version
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response at once."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+
+
+def get_dietary_masks():
+    """Return the distinct dietary tag bitmasks of available products, cached per catalog version."""
+    key = f'catalog:{get_catalog_version()}:dietary-masks'
+    masks = cache.get(key)
+    if masks is None:
+        masks = sorted(
+            Product.objects.filter(available=True).values_list('dietary_tags', flat=True).distinct()
+        )
+        cache.set(key, masks, CATALOG_CACHE_TIMEOUT)
+    return masks
+
+
+def _fragment_key(product, variant):
+    return f'product-json:{product.pk}:{product.updated_at.timestamp():f}:{variant}'
+
+
+def product_fragments(products, variant, serializer_class):
+    """
+    Return each product rendered to JSON bytes by ``serializer_class``, in order.
+
+    Fragments are cached per product and ``variant`` (one per serializer) under
+    the row's updated_at, so a changed product misses the old fragment on
+    every worker, and a row read from a lagging replica can only match the
+    fragment of that same old row. A list only serializes the products that
+    aren't cached yet.
+    """
+    keys = [_fragment_key(product, variant) for product in products]
+    fragments = cache.get_many(keys)
+    missing = [product for product, key in zip(products, keys) if key not in fragments]
+    if missing:
+        renderer = JSONRenderer()
+        rendered = {
+            _fragment_key(product, variant): renderer.render(data)
+            for product, data in zip(missing, serializer_class(missing, many=True).data)
+        }
+        cache.set_many(rendered, CATALOG_CACHE_TIMEOUT)
+        fragments.update(rendered)
+    return [fragments[key] for key in keys]
+
+
+def with_field(fragment, name, value):
+    """Append a per-request field to a rendered product fragment."""
+    return fragment[:-1] + b',"' + name.encode() + b'":' + JSONRenderer().render(value) + b'}'
+
+
+def render_list(fragments):
+    return b'[' + b','.join(fragments) + b']'
+
+
+def render_page(envelope, fragments):
+    """Render a paginated response body whose results are pre-rendered fragments."""
+    envelope = {key: value for key, value in envelope.items() if key != 'results'}
+    body = JSONRenderer().render({**envelope, 'results': []})
+    return body[:-len(b'[]}')] + render_list(fragments) + b'}'
+
+
+def _build_lock(key):
+    with _build_locks_guard:
+        return _build_locks.setdefault(key, threading.Lock())
+
+
+def _render(data):
+    # Builders may return an already rendered body
+    body = data if isinstance(data, bytes) else JSONRenderer().render(data)
+    return f'"{hashlib.sha1(body).hexdigest()}"', body
+
+
+def _rebuild(key, build):
+    lock_key = f'{key}:lock'
+    # Coalesce misses between threads of this process...
+    with _build_lock(key):
+        try:
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+
+            # ...and between processes sharing the cache
+            if cache.add(lock_key, 1, CATALOG_REBUILD_LOCK_TIMEOUT):
+                try:
+                    entry = _render(build())
+                    cache.set(key, entry, CATALOG_CACHE_TIMEOUT)
+                finally:
+                    cache.delete(lock_key)
+                return entry
+
+            deadline = time.monotonic() + CATALOG_REBUILD_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(CATALOG_REBUILD_POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry
+
+            # The other rebuild is stuck or died; don't keep the client waiting on it
+            entry = _render(build())
+            cache.set(key, entry, CATALOG_CACHE_TIMEOUT)
+            return entry
+        finally:
+            with _build_locks_guard:
+                _build_locks.pop(key, None)
+
+
+def cached_catalog_response(request, name, build):
+    """
+    Serve a catalog response from the versioned cache.
+
+    ``build`` returns the response data and is only called on a cache miss.
+    The response carries a strong ETag and a matching If-None-Match gets a 304.
+    """
+    url_hash = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    key = f'catalog:{get_catalog_version()}:{name}:{url_hash}'
+
+    entry = cache.get(key)
+    if entry is None:
+        entry = _rebuild(key, build)
+    etag, body = entry
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
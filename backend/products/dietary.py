@@ -0,0 +1,90 @@
+import re
+
+# Bit positions are stored in Product.dietary_tags; only ever append to this list.
+# Each tag matches the User.is_<tag> preference flag of the same name.
+DIETARY_TAGS = [
+    'vegetarian',
+    'vegan',
+    'pescatarian',
+    'flexitarian',
+    'paleo',
+    'ketogenic',
+    'halal',
+    'kosher',
+    'fruitarian',
+    'gluten_free',
+    'dairy_free',
+    'organic',
+]
+
+TAG_BITS = {tag: 1 << index for index, tag in enumerate(DIETARY_TAGS)}
+
+# Spellings accepted in the free-text dietary_info field
+TAG_SYNONYMS = {
+    'vegetarian': ['vegetarian', 'veggie'],
+    'vegan': ['vegan', 'plant based'],
+    'pescatarian': ['pescatarian', 'pescetarian'],
+    'flexitarian': ['flexitarian'],
+    'paleo': ['paleo'],
+    'ketogenic': ['ketogenic', 'keto'],
+    'halal': ['halal'],
+    'kosher': ['kosher'],
+    'fruitarian': ['fruitarian'],
+    'gluten_free': ['gluten free', 'no gluten'],
+    'dairy_free': ['dairy free', 'lactose free', 'no dairy'],
+    'organic': ['organic'],
+}
+
+# A dish carrying the key tag also suits the diets listed for it
+TAG_IMPLIES = {
+    'fruitarian': ['vegan'],
+    'vegan': ['vegetarian', 'dairy_free'],
+    'vegetarian': ['pescatarian', 'flexitarian'],
+}
+
+# "non-vegetarian", "not halal" and the like must not count as the tag
+_NEGATION = r'(?<!non )(?<!not )'
+
+TAG_PATTERNS = {
+    tag: re.compile(
+        _NEGATION + r'\b(?:' + '|'.join(
+            re.escape(synonym).replace(r'\ ', r'[\s_-]*') for synonym in synonyms
+        ) + r')\b'
+    )
+    for tag, synonyms in TAG_SYNONYMS.items()
+}
+
+
+def _expand(tags):
+    pending = list(tags)
+    expanded = set()
+    while pending:
+        tag = pending.pop()
+        if tag not in expanded:
+            expanded.add(tag)
+            pending.extend(TAG_IMPLIES.get(tag, []))
+    return expanded
+
+
+def parse_dietary_tags(text):
+    """Parse free-text dietary info into a tag bitmask."""
+    if not text:
+        return 0
+    text = re.sub(r'\bnon[\s-]+', 'non ', text.lower())
+    tags = [tag for tag, pattern in TAG_PATTERNS.items() if pattern.search(text)]
+    return sum(TAG_BITS[tag] for tag in _expand(tags))
+
+
+def tag_names(mask):
+    """Return the tag names set in a bitmask, in DIETARY_TAGS order."""
+    return [tag for tag in DIETARY_TAGS if mask & TAG_BITS[tag]]
+
+
+def user_dietary_mask(user):
+    """Return the bitmask of tags a product needs to suit the user's preferences."""
+    return sum(bit for tag, bit in TAG_BITS.items() if getattr(user, f'is_{tag}', False))
+
+
+def compatible_masks(required, masks):
+    """Filter tag bitmasks down to those carrying every required tag."""
+    return [mask for mask in masks if mask & required == required]
@@ -0,0 +1,129 @@
+"""
+Bulk product imports.
+
+A CSV or NDJSON file of products is read row by row, every row is validated
+with ProductImportSerializer and valid rows are upserted on their sku in
+batches: one SELECT of the batch's existing products, a bulk_create of the
+new ones, a bulk_create upsert of the changed ones and a bulk reindex of the
+products whose searchable text changed. Only one batch is held in
+memory at a time. A row that fails validation is reported and skipped; the
+rest of its batch is still written. Bulk writes skip the Product signals, so
+when a batch commits it bumps the catalog version itself; updated rows get a
+new updated_at, which retires their cached JSON fragments.
+"""
+import csv
+import json
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .cache import bump_catalog_version
+from .models import Product
+from .search import build_terms, index_products
+from .serializers import ProductImportSerializer
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_BATCH_SIZE = 1000
+
+# Columns overwritten on products that already exist, besides dietary_tags
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'image_url', 'available', 'category',
+    'ingredients', 'serving_size', 'dietary_info', 'stock',
+]
+
+
+def read_rows(import_format, lines):
+    """
+    Parse an import file given as an iterable of text lines.
+
+    Yields (line_number, row, error) tuples. row is a dict of the row's
+    non-empty values; error is a message when the line could not be parsed.
+    """
+    if import_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}, None
+        return
+
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Each line must be a JSON object'
+            continue
+        yield line_number, row, None
+
+
+def _write_batch(batch):
+    with transaction.atomic():
+        existing = Product.objects.in_bulk(list(batch), field_name='sku')
+        created, updated, reindex = [], [], []
+        for sku, data in batch.items():
+            product = existing.get(sku)
+            if product is None:
+                product = Product(**data)
+                created.append(product)
+                reindex.append(product)
+            else:
+                terms = build_terms(product)
+                for field, value in data.items():
+                    setattr(product, field, value)
+                updated.append(product)
+                # Price and stock updates leave the search terms alone
+                if build_terms(product) != terms:
+                    reindex.append(product)
+            product.set_derived_fields()
+
+        Product.objects.bulk_create(created)
+        # An upsert on sku writes the changed rows in one statement, where
+        # bulk_update would build a CASE per column
+        Product.objects.bulk_create(
+            updated, update_conflicts=True, unique_fields=['sku'],
+            update_fields=UPDATE_FIELDS + ['dietary_tags', 'updated_at'],
+        )
+        index_products(reindex)
+        transaction.on_commit(bump_catalog_version)
+    return len(created), len(updated)
+
+
+def import_products(rows, batch_size=IMPORT_BATCH_SIZE, on_error=None):
+    """
+    Upsert products from read_rows() output.
+
+    ``on_error`` is called with {'line', 'sku', 'errors'} for every rejected
+    row. When a sku appears more than once, the last row wins. Returns
+    {'created', 'updated', 'failed'} counts.
+    """
+    counts = {'created': 0, 'updated': 0, 'failed': 0}
+    # One serializer for every row; building its fields is the expensive part
+    serializer = ProductImportSerializer()
+
+    def flush(batch):
+        created, updated = _write_batch(batch)
+        counts['created'] += created
+        counts['updated'] += updated
+
+    batch = {}
+    for line_number, row, error in rows:
+        if error is None:
+            try:
+                data = serializer.run_validation(row)
+            except ValidationError as e:
+                error = e.detail
+        if error is not None:
+            counts['failed'] += 1
+            if on_error:
+                on_error({'line': line_number, 'sku': (row or {}).get('sku'), 'errors': error})
+            continue
+
+        batch[data['sku']] = data
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = {}
+    if batch:
+        flush(batch)
+    return counts
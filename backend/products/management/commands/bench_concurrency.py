@@ -0,0 +1,63 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+# (label, sync path, async path) relative to --base-url
+ENDPOINTS = [
+    ('categories', '/api/categories/', '/api/async/categories/'),
+    ('products by category', '/api/products/category/all/', '/api/async/products/category/all/'),
+    ('orders', '/api/orders/', '/api/async/orders/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent requests at a running server and compare the sync '
+        'catalog endpoints with their async variants.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--token', help='Access token for the authenticated endpoints')
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f"Bearer {options['token']}"
+
+        for label, sync_path, async_path in ENDPOINTS:
+            for kind, path in (('sync', sync_path), ('async', async_path)):
+                url = options['base_url'].rstrip('/') + path
+                throughput, p50, p95, errors = self.run(
+                    url, headers, options['concurrency'], options['requests']
+                )
+                self.stdout.write(
+                    f'{label:<22} {kind:<5} {throughput:8.1f} req/s  '
+                    f'p50 {p50 * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  errors {errors}'
+                )
+
+    def run(self, url, headers, concurrency, total):
+        session = requests.Session()
+
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, headers=headers, timeout=30).status_code < 400
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        return total / elapsed, statistics.median(latencies), p95, errors
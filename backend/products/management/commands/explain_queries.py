@@ -0,0 +1,100 @@
+import re
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.models import User
+from cart.models import CartItem
+from orders.models import Order, OrderItem
+from orders.views import order_history
+from products.models import Favorite, Product
+from products.pagination import CatalogCursorPagination, after_position
+from products.search import search
+from products.views import category_products, compatible_products, used_categories
+
+# Plan lines that mean a full table read, per database vendor
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)$', re.MULTILINE),
+}
+
+
+def _page(queryset):
+    """Apply the ordering and LIMIT CatalogCursorPagination adds to a catalog queryset."""
+    page_size = settings.CATALOG_PAGE_SIZE
+    return queryset.order_by(*CatalogCursorPagination.ordering)[:page_size + 1]
+
+
+def hot_querysets():
+    """The querysets built by the API views, with sample parameters taken from the data."""
+    user_id = Order.objects.values_list('user_id', flat=True).first() or 0
+    order_ids = list(order_history(user_id).values_list('id', flat=True)[:10]) or [0]
+    category = Product.objects.exclude(category='ALL').values_list('category', flat=True).first() or 'AGAHAN'
+    # A cursor position for the next-page queries
+    position = (datetime(2000, 1, 1, tzinfo=timezone.utc), 0)
+    dieter = User(is_vegetarian=True, is_gluten_free=True)
+
+    return [
+        ('products-by-category ALL', _page(category_products('ALL'))),
+        (f'products-by-category {category}', _page(category_products(category))),
+        (f'products-by-category {category} (next page)', _page(after_position(category_products(category), *position))),
+        ('categories', used_categories()),
+        ('products-compatible', _page(compatible_products(dieter))),
+        ('products-search', search('rice')[:20]),
+        ('product-list', _page(Product.objects.all())),
+        ('favorites', Favorite.objects.filter(user_id=user_id)),
+        ('favorite ids', Favorite.objects.filter(user_id=user_id).values_list('product_id', flat=True)),
+        ('cart-items', CartItem.objects.filter(user_id=user_id).select_related('product')),
+        ('get-orders', order_history(user_id)),
+        ('get-orders items prefetch', OrderItem.objects.filter(order_id__in=order_ids)),
+        ('create-order idempotency lookup', Order.objects.filter(user_id=user_id, idempotency_key='key')),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the ORM queries the API views build and flag sequential scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-seqscan', action='store_true',
+            help='PostgreSQL: disable seq scans so small tables still show whether an index is usable.',
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Exit with an error when any query scans a whole table.',
+        )
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            self.stderr.write(f'Sequential scan detection is not supported on {connection.vendor}; printing plans only.')
+
+        flagged = []
+        with transaction.atomic():
+            if options['no_seqscan'] and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for label, queryset in hot_querysets():
+                plan = queryset.explain()
+                scans = pattern.findall(plan) if pattern else []
+                if scans:
+                    flagged.append(label)
+                    self.stdout.write(self.style.WARNING(
+                        f'{label}: sequential scan on {", ".join(sorted(set(scans)))}'
+                    ))
+                else:
+                    self.stdout.write(f'{label}: ok')
+                if scans or options['verbosity'] > 1:
+                    self.stdout.write(f'    {str(queryset.query)}')
+                    self.stdout.write('\n'.join(f'    {line}' for line in plan.splitlines()))
+
+        if flagged:
+            message = f'{len(flagged)} queries scan a whole table'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans'))
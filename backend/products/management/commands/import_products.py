@@ -0,0 +1,37 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.imports import IMPORT_BATCH_SIZE, IMPORT_FORMATS, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create or update products from a CSV or NDJSON file, matched on sku.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument(
+            '--format', dest='import_format', choices=IMPORT_FORMATS,
+            help='File format. Defaults to the file extension.',
+        )
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        import_format = options['import_format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f'Pass --format; one of: {", ".join(IMPORT_FORMATS)}')
+
+        def report(error):
+            self.stderr.write(json.dumps(error))
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as lines:
+                counts = import_products(
+                    read_rows(import_format, lines), batch_size=options['batch_size'], on_error=report
+                )
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        message = f"Created {counts['created']}, updated {counts['updated']}, rejected {counts['failed']} products"
+        self.stdout.write(self.style.WARNING(message) if counts['failed'] else self.style.SUCCESS(message))
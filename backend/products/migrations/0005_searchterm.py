@@ -0,0 +1,72 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:15
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of products.search.build_terms as of this migration, so later
+# changes to the live index don't rewrite what this migration did
+FIELD_WEIGHTS = {
+    'name': 10,
+    'dietary_info': 4,
+    'ingredients': 3,
+    'description': 1,
+}
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 50
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) >= MIN_TERM_LENGTH
+    ]
+
+
+def build_terms(product):
+    weights = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(product, field)):
+            weights[token] += weight
+    return weights
+
+
+def build_search_index(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    SearchTerm = apps.get_model('products', 'SearchTerm')
+    entries = []
+    for product in Product.objects.iterator():
+        entries.extend(
+            SearchTerm(term=term, product_id=product.pk, weight=weight)
+            for term, weight in build_terms(product).items()
+        )
+    SearchTerm.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_alter_product_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=50)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='products.product')),
+            ],
+            options={
+                'unique_together': {('term', 'product')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:20
+
+import re
+
+from django.db import migrations, models
+
+# A frozen copy of products.dietary.parse_dietary_tags as of this migration, so
+# later changes to the live parser don't rewrite what this migration did
+DIETARY_TAGS = [
+    'vegetarian', 'vegan', 'pescatarian', 'flexitarian', 'paleo', 'ketogenic',
+    'halal', 'kosher', 'fruitarian', 'gluten_free', 'dairy_free', 'organic',
+]
+TAG_BITS = {tag: 1 << index for index, tag in enumerate(DIETARY_TAGS)}
+TAG_SYNONYMS = {
+    'vegetarian': ['vegetarian', 'veggie'],
+    'vegan': ['vegan', 'plant based'],
+    'pescatarian': ['pescatarian', 'pescetarian'],
+    'flexitarian': ['flexitarian'],
+    'paleo': ['paleo'],
+    'ketogenic': ['ketogenic', 'keto'],
+    'halal': ['halal'],
+    'kosher': ['kosher'],
+    'fruitarian': ['fruitarian'],
+    'gluten_free': ['gluten free', 'no gluten'],
+    'dairy_free': ['dairy free', 'lactose free', 'no dairy'],
+    'organic': ['organic'],
+}
+TAG_IMPLIES = {
+    'fruitarian': ['vegan'],
+    'vegan': ['vegetarian', 'dairy_free'],
+    'vegetarian': ['pescatarian', 'flexitarian'],
+}
+_NEGATION = r'(?<!non )(?<!not )'
+TAG_PATTERNS = {
+    tag: re.compile(
+        _NEGATION + r'\b(?:' + '|'.join(
+            re.escape(synonym).replace(r'\ ', r'[\s_-]*') for synonym in synonyms
+        ) + r')\b'
+    )
+    for tag, synonyms in TAG_SYNONYMS.items()
+}
+
+
+def _expand(tags):
+    pending = list(tags)
+    expanded = set()
+    while pending:
+        tag = pending.pop()
+        if tag not in expanded:
+            expanded.add(tag)
+            pending.extend(TAG_IMPLIES.get(tag, []))
+    return expanded
+
+
+def parse_dietary_tags(text):
+    if not text:
+        return 0
+    text = re.sub(r'\bnon[\s-]+', 'non ', text.lower())
+    tags = [tag for tag, pattern in TAG_PATTERNS.items() if pattern.search(text)]
+    return sum(TAG_BITS[tag] for tag in _expand(tags))
+
+
+def parse_existing_dietary_info(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    products = list(Product.objects.exclude(dietary_info__isnull=True).only('id', 'dietary_info'))
+    for product in products:
+        product.dietary_tags = parse_dietary_tags(product.dietary_info)
+    Product.objects.bulk_update(products, ['dietary_tags'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_searchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='dietary_tags',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(parse_existing_dietary_info, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings 
 
+from .dietary import parse_dietary_tags
+
 class Product(models.Model):
     CATEGORY_CHOICES = [
         ('ALL', 'all'),
@@ -16,12 +18,65 @@ class Product(models.Model):
     image_url = models.CharField(max_length=255, blank=True, null=True)
     available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Part of the cached JSON fragments' keys; bulk writes must set it too
+    updated_at = models.DateTimeField(auto_now=True)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='ALL')
     
     # New fields
     ingredients = models.TextField(blank=True, null=True)
     serving_size = models.CharField(max_length=100, blank=True, null=True)
     dietary_info = models.TextField(blank=True, null=True)
+    # Bitmask over products.dietary.DIETARY_TAGS, derived from dietary_info on save
+    dietary_tags = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    # Portions left; empty means stock isn't tracked. Checkout takes it to 0 and marks the product
+    # unavailable; saving it with stock again makes it available
+    stock = models.PositiveIntegerField(blank=True, null=True)
+    # Stable external key that bulk imports match rows on
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pages of the full catalog, ordered like CatalogCursorPagination
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+            # Keyset pages of one category; only available products are listed
+            models.Index(
+                fields=['category', 'created_at', 'id'],
+                condition=models.Q(available=True),
+                name='product_avail_category_idx',
+            ),
+            # Distinct categories for get_categories without reading the table
+            models.Index(fields=['category'], name='product_category_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        product._sold_out = product._is_sold_out()
+        return product
+
+    def _is_sold_out(self):
+        # Deferred fields aren't in __dict__ and don't count
+        return self.__dict__.get('stock') == 0 and self.__dict__.get('available') is False
+
+    def set_derived_fields(self):
+        """Recompute the fields save() derives from others; bulk writes call this themselves."""
+        self.dietary_tags = parse_dietary_tags(self.dietary_info)
+        if self.stock == 0:
+            self.available = False
+        elif getattr(self, '_sold_out', False):
+            # Restocking a product that checkout sold out puts it back on sale
+            self.available = True
+
+    def save(self, *args, **kwargs):
+        self.set_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'dietary_info' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'dietary_tags'}
+        if update_fields is not None and 'stock' in update_fields:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'available'}
+        super().save(*args, **kwargs)
+        self._sold_out = self._is_sold_out()
+
     def __str__(self):
         return self.name
     
@@ -36,4 +91,17 @@ class Favorite(models.Model):
         unique_together = ('user', 'product')
         
     def __str__(self):
-        return f"{self.user.username} - {self.product.name}"
\ No newline at end of file
+        return f"{self.user.username} - {self.product.name}"
+
+
+class SearchTerm(models.Model):
+    # Inverted index entry: one row per (term, product), maintained by products.signals
+    term = models.CharField(max_length=50, db_index=True)
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('term', 'product')
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id}"
@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class SearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def encode_position(product):
+    """The cursor for the page after ``product``."""
+    raw = f'{product.created_at.isoformat()}|{product.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_position(cursor):
+    """Return the (created_at, id) a cursor points after; raises ValueError for a malformed one."""
+    created_at, product_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(product_id)
+
+
+def after_position(queryset, created_at, product_id):
+    # The row-value comparison (created_at, id) > (%s, %s), spelled so the
+    # (created_at, id) indexes serve it
+    return queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=product_id))
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id) so deep pages cost the same as the first.
+
+    The cursor holds the last row's created_at and id, and the next page starts
+    right after that pair, so products created at the same instant are neither
+    skipped nor read past with an offset. Pages only link forward.
+
+    Clients that still expect a bare list can pass ?legacy=true, or the whole
+    deployment can opt out with the LEGACY_LIST_RESPONSES setting.
+    """
+    ordering = ('created_at', 'id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    legacy_query_param = 'legacy'
+
+    def __init__(self):
+        self.page_size = settings.CATALOG_PAGE_SIZE
+
+    def is_legacy(self, request):
+        if getattr(settings, 'LEGACY_LIST_RESPONSES', False):
+            return True
+        return request.query_params.get(self.legacy_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_legacy(request):
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = after_position(queryset, *decode_position(cursor))
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+
+        # One row past the page tells whether there is a next one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        self.has_next = len(results) > self.page_size
+        self.has_previous = False
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_position(self.page[-1]))
+
+    def get_previous_link(self):
+        return None
@@ -0,0 +1,115 @@
+import operator
+import re
+from collections import Counter
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+
+from .models import Product, SearchTerm
+
+# Matches in the name count the most, free-text description the least
+FIELD_WEIGHTS = {
+    'name': 10,
+    'dietary_info': 4,
+    'ingredients': 3,
+    'description': 1,
+}
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 50
+MAX_QUERY_TERMS = 8
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Split text into lowercase search terms."""
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) >= MIN_TERM_LENGTH
+    ]
+
+
+def build_terms(product):
+    """Return a {term: weight} mapping for the indexed fields of a product."""
+    weights = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(product, field)):
+            weights[token] += weight
+    return weights
+
+
+def index_product(product, using=None):
+    """Replace the index entries of a single product."""
+    terms = build_terms(product)
+    with transaction.atomic(using=using):
+        SearchTerm.objects.using(using).filter(product_id=product.pk).delete()
+        SearchTerm.objects.using(using).bulk_create([
+            SearchTerm(term=term, product_id=product.pk, weight=weight)
+            for term, weight in terms.items()
+        ])
+
+
+def index_products(products, batch_size=1000):
+    """Replace the index entries of many products at once, for bulk writes that skip the signals."""
+    SearchTerm.objects.filter(product_id__in=[product.pk for product in products]).delete()
+    SearchTerm.objects.bulk_create(
+        [
+            SearchTerm(term=term, product_id=product.pk, weight=weight)
+            for product in products
+            for term, weight in build_terms(product).items()
+        ],
+        batch_size=batch_size,
+    )
+
+
+def rebuild_index(batch_size=1000):
+    """Rebuild the whole index from the product table. Returns the number of products indexed."""
+    count = 0
+    with transaction.atomic():
+        SearchTerm.objects.all().delete()
+        entries = []
+        products = Product.objects.only(*FIELD_WEIGHTS).iterator(chunk_size=batch_size)
+        for product in products:
+            entries.extend(
+                SearchTerm(term=term, product_id=product.pk, weight=weight)
+                for term, weight in build_terms(product).items()
+            )
+            if len(entries) >= batch_size:
+                SearchTerm.objects.bulk_create(entries)
+                entries = []
+            count += 1
+        SearchTerm.objects.bulk_create(entries)
+    return count
+
+
+def search(query):
+    """
+    Rank available products against a free-text query.
+
+    Every query term must prefix-match at least one indexed term of a product
+    (so results narrow as the user keeps typing). Returns a queryset of
+    {'product_id', 'score'} rows, best matches first.
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not tokens:
+        return SearchTerm.objects.none().values('product_id')
+
+    matches = [Q(term__startswith=token) for token in tokens]
+    matched_tokens = reduce(operator.add, [
+        Max(Case(When(match, then=1), default=0, output_field=IntegerField()))
+        for match in matches
+    ])
+    return (
+        SearchTerm.objects
+        .filter(reduce(operator.or_, matches), product__available=True)
+        .values('product_id')
+        .annotate(score=Sum('weight'), matched=matched_tokens)
+        .filter(matched=len(tokens))
+        .values('product_id', 'score')
+        .order_by('-score', 'product_id')
+    )
@@ -1,14 +1,20 @@
 from rest_framework import serializers
 from .models import Product, Favorite   
+from .cache import get_favorite_product_ids
+from .dietary import tag_names
 
 class ProductSerializer(serializers.ModelSerializer):
     category_display = serializers.CharField(source='get_category_display', read_only=True)
+    dietary_tags = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
         fields = ['id', 'name', 'description', 'price', 'image_url', 'available', 
                  'category', 'category_display', 'created_at', 
-                 'ingredients', 'serving_size', 'dietary_info']
+                 'ingredients', 'serving_size', 'dietary_info', 'dietary_tags']
+
+    def get_dietary_tags(self, obj):
+        return tag_names(obj.dietary_tags)
         
 class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,17 +28,34 @@ class FavoriteSerializer(serializers.ModelSerializer):
         validated_data['user'] = user
         return super().create(validated_data)
 
-class ProductWithFavoriteSerializer(serializers.ModelSerializer):
-    is_favorite = serializers.SerializerMethodField()
-    
+class ProductCardSerializer(serializers.ModelSerializer):
+    """The product fields of ProductWithFavoriteSerializer, the same for every user."""
+
     class Meta:
         model = Product
         fields = ['id', 'name', 'description', 'price', 'image_url', 
                   'available', 'category', 'ingredients', 'serving_size', 
-                  'dietary_info', 'is_favorite']
+                  'dietary_info']
+
+class ProductWithFavoriteSerializer(ProductCardSerializer):
+    is_favorite = serializers.SerializerMethodField()
+    
+    class Meta(ProductCardSerializer.Meta):
+        fields = ProductCardSerializer.Meta.fields + ['is_favorite']
         
     def get_is_favorite(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Favorite.objects.filter(user=user, product=obj).exists()
\ No newline at end of file
+        # Resolve the user's favorites once and share them across the whole list
+        favorite_ids = self.context.get('favorite_ids')
+        if favorite_ids is None:
+            request = self.context.get('request')
+            favorite_ids = get_favorite_product_ids(request.user if request else None)
+            self.context['favorite_ids'] = favorite_ids
+        return obj.id in favorite_ids
+
+class ProductImportSerializer(ProductSerializer):
+    """Validates one row of a bulk product import; rows are matched on sku."""
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['sku', 'stock']
+        # Uniqueness is what the import matches on, so don't check it with a query per row
+        extra_kwargs = {'sku': {'required': True, 'allow_null': False, 'allow_blank': False, 'validators': []}}
@@ -0,0 +1,33 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version, invalidate_favorite_product_ids
+from .models import Favorite, Product
+from .search import index_product
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, raw=False, using=None, **kwargs):
+    # Skip fixture loading; index entries of deleted products go away with the FK cascade
+    if raw:
+        return
+    index_product(instance, using=using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, instance, using=None, **kwargs):
+    # Fires for ProductAdmin edits and deletes too; wait for the commit so a
+    # concurrent rebuild can't cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version, using=using)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorites_cache(sender, instance, using=None, **kwargs):
+    # Covers toggle_favorite as well as the viewset, the admin and cascades.
+    # After the commit, so a request on another worker can't re-cache the old set
+    transaction.on_commit(partial(invalidate_favorite_product_ids, instance.user_id), using=using)
@@ -1,3 +1,240 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+
+from backend.testing import BudgetTestCase
+from orders.stock import reserve_stock
+from .cache import favorites_cache_key, get_catalog_version, get_favorite_product_ids
+from .dietary import TAG_BITS
+from .models import Favorite, Product
+from .search import search
+from .serializers import ProductSerializer, ProductWithFavoriteSerializer
+
+
+class ProductsBudgetTests(BudgetTestCase):
+    def test_products_search(self):
+        response = self.check_route('products-search', query='?q=dish rice')
+        self.assertGreater(response.json()['count'], 0)
+
+    def test_products_compatible(self):
+        self.user.is_vegan = True
+        self.user.save()
+        response = self.check_route('products-compatible')
+        self.assertTrue(response.json()['results'])
+
+    def test_products_by_category(self):
+        response = self.check_route('products-by-category', kwargs={'category': 'ALL'})
+        self.assertTrue(response.json()['next'])
+
+    def test_products_by_category_deep_page(self):
+        response = self.client.get('/api/products/category/ALL/?page_size=100')
+        for _ in range(5):
+            response = self.client.get(response.json()['next'])
+        self.check_route('products-by-category', kwargs={'category': 'ALL'},
+                         query='?' + response.json()['next'].split('?', 1)[1])
+
+    def test_products_created_together_are_paged_by_id(self):
+        tied = sorted(product.pk for product in self.products[:30])
+        Product.objects.filter(pk__in=tied).update(created_at=timezone.now() - timedelta(days=3650))
+        ids, url = [], '/api/products/?page_size=7'
+        while len(ids) < len(tied):
+            body = self.client.get(url).json()
+            ids += [row['id'] for row in body['results']]
+            url = body['next']
+        self.assertEqual(ids[:len(tied)], tied)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/products/category/ALL/?cursor=bm90IGEgY3Vyc29y')
+        self.assertEqual(response.status_code, 404)
+
+    def test_categories(self):
+        self.check_route('categories')
+
+    def test_async_categories(self):
+        self.check_async_route('async-categories')
+
+    def test_async_products_by_category(self):
+        self.check_async_route('async-products-by-category', kwargs={'category': 'TANGHALIAN'})
+
+    def test_async_product_detail(self):
+        response = self.check_async_route('async-product-detail', kwargs={'pk': self.products[0].pk})
+        self.assertFalse(json.loads(response.content)['is_favorite'])
+
+    def test_async_product_detail_matches_sync(self):
+        product_id = self.user.favorites.first().product_id
+        token = self.access_token(self.user)
+        response = self.check_async_route(
+            'async-product-detail', kwargs={'pk': product_id}, headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertTrue(json.loads(response.content)['is_favorite'])
+        sync_response = self.client.get(f'/api/products/{product_id}/', SERVER_NAME='localhost')
+        self.assertEqual(json.loads(response.content), sync_response.json())
+
+    def test_api_root(self):
+        self.check_route('api-root')
+
+    def test_product_list(self):
+        self.check_route('product-list')
+
+    def test_product_detail(self):
+        self.check_route('product-detail', kwargs={'pk': self.products[0].pk})
+
+    def test_favorite_list(self):
+        response = self.check_route('favorite-list')
+        # Only the catalog lists are paginated
+        self.assertIsInstance(response.json(), list)
+
+    def test_favorite_detail(self):
+        favorite = self.user.favorites.first()
+        self.check_route('favorite-detail', kwargs={'pk': favorite.pk})
+
+    def test_favorite_toggle(self):
+        self.check_route('favorite-toggle-favorite', 'post',
+                         kwargs={'product_id': self.products[-1].pk}, expected_status=201)
+
+    def test_favorites_cache_is_dropped_after_commit(self):
+        product = self.products[-1]
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.user, product=product)
+            # Another worker reading before the commit caches the old favorites
+            cache.set(favorites_cache_key(self.user.pk), frozenset())
+        self.assertIn(product.pk, get_favorite_product_ids(self.user))
+
+    def test_favorites_list(self):
+        response = self.check_route('favorite-favorites-list', query='?legacy=true')
+        self.assertEqual(len(response.json()), 10)
+
+    def test_favorite_admin_changelist(self):
+        self.check_route('admin:products_favorite_changelist', client=self.admin_client())
+
+
+class QueryPlanTests(BudgetTestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        # The test tables are small enough for PostgreSQL to prefer a full scan
+        call_command('explain_queries', '--fail', '--no-seqscan', verbosity=2, stdout=out)
+        self.assertIn('No sequential scans', out.getvalue())
+
+
+class ProductImportTests(BudgetTestCase):
+    CSV = (
+        'sku,name,price,category,dietary_info,description\n'
+        'DISH-0,Dish 0 (new recipe),99.50,AGAHAN,,\n'
+        'NEW-1,Ube halaya,45.00,MERIENDA,Vegan,"Purple yam jam, made in house"\n'
+        'NEW-2,Broken row,not a price,MERIENDA,,\n'
+    )
+
+    def setUp(self):
+        super().setUp()
+        Product.objects.filter(pk=self.products[0].pk).update(sku='DISH-0')
+
+    def upload(self, content, name='products.csv'):
+        return {'file': SimpleUploadedFile(name, content.encode())}
+
+    def test_import_endpoint(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.check_route('products-import', 'post', kwargs={'import_format': 'csv'},
+                                        data=self.upload(self.CSV), format='multipart',
+                                        client=self.admin_client())
+        body = response.json()
+        self.assertEqual((body['created'], body['updated'], body['failed']), (1, 1, 1))
+        self.assertEqual(body['errors'][0]['line'], 4)
+        self.assertIn('price', body['errors'][0]['errors'])
+
+        updated = Product.objects.get(sku='DISH-0')
+        self.assertEqual(updated.name, 'Dish 0 (new recipe)')
+        # Columns left empty keep their current values
+        self.assertEqual(updated.description, self.products[0].description)
+        created = Product.objects.get(sku='NEW-1')
+        self.assertTrue(created.dietary_tags & TAG_BITS['vegan'])
+        self.assertEqual([row['product_id'] for row in search('ube')], [created.pk])
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_import_restocks_sold_out_product(self):
+        Product.objects.filter(sku='DISH-0').update(stock=0, available=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.check_route('products-import', 'post', kwargs={'import_format': 'csv'},
+                             data=self.upload('sku,name,price,stock\nDISH-0,Dish 0,99.50,5\n'),
+                             format='multipart', client=self.admin_client())
+        product = Product.objects.get(sku='DISH-0')
+        self.assertEqual((product.stock, product.available), (5, True))
+
+    def test_import_is_admin_only(self):
+        self.check_route('products-import', 'post', kwargs={'import_format': 'csv'},
+                         data=self.upload(self.CSV), format='multipart', expected_status=403)
+        self.assertFalse(Product.objects.filter(sku='NEW-1').exists())
+
+    def test_import_command(self):
+        rows = [
+            {'sku': 'NEW-1', 'name': 'Turon', 'price': '30.00', 'stock': 10},
+            {'sku': 'NEW-1', 'name': 'Turon', 'price': '35.00', 'stock': 0},
+            {'sku': 'NEW-2', 'price': '20.00'},
+        ]
+        lines = [json.dumps(row) for row in rows] + ['{not json']
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.ndjson')
+            with open(path, 'w') as file:
+                file.write('\n'.join(lines))
+            out, err = StringIO(), StringIO()
+            call_command('import_products', path, '--batch-size', '1', stdout=out, stderr=err)
+
+        self.assertIn('Created 1, updated 1, rejected 2 products', out.getvalue())
+        errors = [json.loads(line) for line in err.getvalue().splitlines()]
+        self.assertEqual([error['line'] for error in errors], [3, 4])
+        product = Product.objects.get(sku='NEW-1')
+        self.assertEqual((product.price, product.stock, product.available), (35, 0, False))
+
+
+class ProductFragmentTests(BudgetTestCase):
+    def test_category_page_matches_serializer(self):
+        response = self.client.get('/api/products/category/AGAHAN/?page_size=10')
+        products = list(Product.objects.filter(category='AGAHAN', available=True).order_by('created_at', 'id')[:10])
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(ProductSerializer(products, many=True).data)))
+
+    def test_product_list_patches_in_favorites(self):
+        response = self.client.get('/api/products/?page_size=20')
+        products = list(Product.objects.order_by('created_at', 'id')[:20])
+        context = {'favorite_ids': set(Favorite.objects.filter(user=self.user).values_list('product_id', flat=True))}
+        expected = ProductWithFavoriteSerializer(products, many=True, context=context).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+        self.assertTrue(any(row['is_favorite'] for row in response.json()['results']))
+
+        # Another user shares the cached fragments but not the favorites
+        other = self.client_for(self.other_user).get('/api/products/?page_size=20').json()['results']
+        self.assertEqual([row['name'] for row in other], [row['name'] for row in response.json()['results']])
+        self.assertNotEqual([row['is_favorite'] for row in other],
+                            [row['is_favorite'] for row in response.json()['results']])
+
+    def test_saved_product_is_rerendered(self):
+        product = self.products[0]
+        self.client.get('/api/products/?page_size=5')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Renamed dish'
+            product.save()
+        names = [row['name'] for row in self.client.get('/api/products/?page_size=5').json()['results']]
+        self.assertIn('Renamed dish', names)
+
+    def test_changed_row_never_matches_an_old_fragment(self):
+        product = self.products[0]
+        self.client.get('/api/products/?page_size=5')
+        # No signal and no invalidation, as for a write seen by another worker
+        Product.objects.filter(pk=product.pk).update(name='Renamed dish', updated_at=timezone.now())
+        names = [row['name'] for row in self.client.get('/api/products/?page_size=5').json()['results']]
+        self.assertIn('Renamed dish', names)
+
+    def test_sold_out_product_is_rerendered(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock=1)
+        self.client.get('/api/products/?page_size=5')
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock({product.pk: 1})
+        rows = self.client.get('/api/products/?page_size=5').json()['results']
+        self.assertFalse(next(row for row in rows if row['id'] == product.pk)['available'])
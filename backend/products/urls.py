@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 # Set up a router for viewsets
 router = DefaultRouter()
@@ -8,9 +8,17 @@ router.register(r'products', views.ProductViewSet, basename='product')
 router.register(r'favorites', views.FavoriteViewSet, basename='favorite')
 
 urlpatterns = [
+    path('products/search/', views.search_products, name='products-search'),
+    path('products/compatible/', views.get_compatible_products, name='products-compatible'),
     path('products/category/<str:category>/', views.get_products_by_category, name='products-by-category'),
+    path('products/import.<str:import_format>', views.bulk_import_products, name='products-import'),
     path('categories/', views.get_categories, name='categories'),
     
+    # Async variants of the hot reads (ASGI deployments)
+    path('async/categories/', async_views.get_categories, name='async-categories'),
+    path('async/products/category/<str:category>/', async_views.get_products_by_category, name='async-products-by-category'),
+    path('async/products/<int:pk>/', async_views.get_product_detail, name='async-product-detail'),
+    
     # Include viewset URLs (this handles /products/ and /favorites/)
     path('', include(router.urls)),
 ]
@@ -1,30 +1,62 @@
+import codecs
+
+from django.http import HttpResponse
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from .models import Product, Favorite
-from .serializers import ProductSerializer,FavoriteSerializer,ProductWithFavoriteSerializer
+from .serializers import ProductSerializer,FavoriteSerializer,ProductWithFavoriteSerializer,ProductCardSerializer
+from .pagination import CatalogCursorPagination, SearchPagination
+from .search import search
+from .cache import (
+    cached_catalog_response, get_dietary_masks, get_favorite_product_ids,
+    product_fragments, render_list, render_page, with_field,
+)
+from .dietary import compatible_masks, user_dietary_mask
+from .imports import IMPORT_FORMATS, import_products, read_rows
 from rest_framework.decorators import action 
 from rest_framework import viewsets, status, permissions
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def get_products_by_category(request, category):
-    """Fetch products filtered by category."""
+def category_products(category):
     if category.upper() == 'ALL':
-        products = Product.objects.filter(available=True)
-    else:
-        products = Product.objects.filter(category=category.upper(), available=True)
+        return Product.objects.filter(available=True)
+    return Product.objects.filter(category=category.upper(), available=True)
+
+def used_categories():
+    # Unique categories actually used in the database
+    return Product.objects.values_list('category', flat=True).distinct().order_by('category')
+
+def compatible_products(user, category='ALL'):
+    products = Product.objects.filter(available=True)
+    if category != 'ALL':
+        products = products.filter(category=category)
     
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    # Turn the bitwise match into an indexed IN over the tag combinations the menu actually has
+    required = user_dietary_mask(user)
+    if required:
+        products = products.filter(dietary_tags__in=compatible_masks(required, get_dietary_masks()))
+    return products
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def get_categories(request):
-    """Get all available product categories."""
-    # Get unique categories actually used in the database
-    used_categories = Product.objects.values_list('category', flat=True).distinct().order_by('category')
+def _products_by_category_body(request, category):
+    return _paginated_products_body(request, category_products(category))
+
+def _paginated_products_body(request, products):
+    # Assemble the JSON body from cached per-product fragments instead of serializing every row
+    paginator = CatalogCursorPagination()
+    page = paginator.paginate_queryset(products, request)
+    if page is None:
+        return render_list(product_fragments(list(products), 'product', ProductSerializer))
     
+    fragments = product_fragments(page, 'product', ProductSerializer)
+    return render_page(paginator.get_paginated_response([]).data, fragments)
+
+def json_body_response(body):
+    return HttpResponse(body, content_type='application/json')
+
+def _categories_data():
+    return build_categories(list(used_categories()))
+
+def build_categories(used_categories):
     # Map categories to their display names using the CATEGORY_CHOICES
     category_dict = dict(Product.CATEGORY_CHOICES)
     
@@ -37,15 +69,98 @@ def get_categories(request):
     for cat in used_categories:
         categories.append({"value": cat, "label": category_dict.get(cat, cat)})
     
-    return Response(categories)
+    return categories
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_products_by_category(request, category):
+    """Fetch products filtered by category."""
+    return cached_catalog_response(
+        request, 'products', lambda: _products_by_category_body(request, category)
+    )
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_categories(request):
+    """Get all available product categories."""
+    return cached_catalog_response(request, 'categories', _categories_data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_compatible_products(request):
+    """Fetch available products that suit the user's dietary preferences."""
+    category = request.query_params.get('category', 'ALL').upper()
+    products = compatible_products(request.user, category)
+    return json_body_response(_paginated_products_body(request, products))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_products(request):
+    """Search available products, best matches first."""
+    paginator = SearchPagination()
+    page = paginator.paginate_queryset(search(request.query_params.get('q', '')), request)
+    
+    # Load the page of products in one query and keep the ranking order
+    products = Product.objects.in_bulk([row['product_id'] for row in page])
+    results = [products[row['product_id']] for row in page if row['product_id'] in products]
+    
+    fragments = product_fragments(results, 'product', ProductSerializer)
+    return json_body_response(render_page(paginator.get_paginated_response([]).data, fragments))
+
+# Rejected rows listed in the response; the counts cover all of them
+MAX_REPORTED_IMPORT_ERRORS = 100
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_import_products(request, import_format):
+    """Create or update products from an uploaded CSV or NDJSON file, matched on sku."""
+    if import_format not in IMPORT_FORMATS:
+        return Response(
+            {'error': f'Format must be one of: {", ".join(IMPORT_FORMATS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload the products as a "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    errors = []
+    def report(error):
+        if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+            errors.append(error)
+    
+    # Large uploads are spooled to disk by Django; read them back a line at a time
+    lines = codecs.iterdecode(upload, 'utf-8-sig')
+    try:
+        counts = import_products(read_rows(import_format, lines), on_error=report)
+    except UnicodeDecodeError:
+        return Response({'error': 'The file must be UTF-8 encoded'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({**counts, 'errors': errors})
+
+def _favorite_list_response(request, paginator, products, favorite_ids):
+    """List products with is_favorite, from the cached fragments of the fields every user shares."""
+    page = paginator.paginate_queryset(products, request)
+    items = list(products) if page is None else page
+    fragments = [
+        with_field(fragment, 'is_favorite', product.pk in favorite_ids)
+        for product, fragment in zip(items, product_fragments(items, 'card', ProductCardSerializer))
+    ]
+    if page is None:
+        return json_body_response(render_list(fragments))
+    return json_body_response(render_page(paginator.get_paginated_response([]).data, fragments))
 
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductWithFavoriteSerializer
+    pagination_class = CatalogCursorPagination
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
+        context['favorite_ids'] = get_favorite_product_ids(self.request.user)
         return context
+    
+    def list(self, request, *args, **kwargs):
+        products = self.filter_queryset(self.get_queryset())
+        return _favorite_list_response(request, self.paginator, products, get_favorite_product_ids(request.user))
 
 class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
@@ -58,11 +173,10 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     def toggle_favorite(self, request, product_id=None):
         try:
             product = Product.objects.get(pk=product_id)
-            favorite = Favorite.objects.filter(user=request.user, product=product)
+            # Remove from favorites; the per-user favorites cache is invalidated by products.signals
+            deleted, _ = Favorite.objects.filter(user=request.user, product=product).delete()
             
-            if favorite.exists():
-                # Remove from favorites
-                favorite.delete()
+            if deleted:
                 return Response({'status': 'removed from favorites'}, status=status.HTTP_200_OK)
             else:
                 # Add to favorites
@@ -74,9 +188,7 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def favorites_list(self, request):
-        favorites = self.get_queryset()
-        product_ids = favorites.values_list('product_id', flat=True)
-        products = Product.objects.filter(id__in=product_ids)
-        
-        serializer = ProductWithFavoriteSerializer(products, many=True, context={'request': request})
-        return Response(serializer.data)
+        favorite_ids = get_favorite_product_ids(request.user)
+        products = Product.objects.filter(id__in=favorite_ids)
+        # Paginated like the catalog; the plain favorites list is not
+        return _favorite_list_response(request, CatalogCursorPagination(), products, favorite_ids)
@@ -41,10 +41,31 @@ export const removeFromCart = async (productId: number): Promise<void> => {
   }
 };
 
+export interface CartOperation {
+  op: 'set' | 'increment' | 'remove';
+  product_id: number;
+  quantity?: number;
+}
+
+// Apply several cart edits in one request and get the resulting cart back
+export const batchUpdateCart = async (operations: CartOperation[]): Promise<CartItem[]> => {
+  try {
+    const response = await api.post('/cart/batch/', { operations });
+    return response.data;
+  } catch (error) {
+    console.error('Error updating cart:', error);
+    throw error;
+  }
+};
+
 export const updateCartItemQuantity = async (productId: number, quantity: number): Promise<CartItem> => {
   try {
-    await removeFromCart(productId);
-    return await addToCart(productId, quantity);
+    const cartItems = await batchUpdateCart([{ op: 'set', product_id: productId, quantity }]);
+    const updatedItem = cartItems.find(item => item.product === productId);
+    if (!updatedItem) {
+      throw new Error('Item missing from updated cart');
+    }
+    return updatedItem;
   } catch (error) {
     console.error('Error updating cart item quantity:', error);
     throw error;
@@ -27,7 +27,9 @@ export const favoriteApi = {
    */
   getFavoritesList: async (): Promise<Product[]> => {
     try {
-      const response = await api.get('/favorites/favorites_list/');
+      const response = await api.get('/favorites/favorites_list/', {
+        params: { legacy: true }
+      });
       return response.data;
     } catch (error) {
       console.error('Error fetching favorites:', error);
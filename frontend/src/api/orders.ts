@@ -1,4 +1,6 @@
+import axios from 'axios';
 import api from './api';
+import { ACCESS_TOKEN } from './constants';
 
 // Interfaces for TypeScript type safety
 export interface OrderItem {
@@ -17,10 +19,26 @@ export interface Order {
   items: OrderItem[];
 }
 
+// Wait before reopening a closed order event stream, doubling per failed
+// attempt up to the maximum
+const ORDER_EVENTS_RETRY_MS = 5000;
+const ORDER_EVENTS_MAX_RETRY_MS = 5 * 60 * 1000;
+// Ticket responses that retrying won't change: logged out, or a deploy that
+// doesn't serve the stream
+const ORDER_EVENTS_FATAL_STATUSES = [401, 403, 404, 501];
+
+export interface OrderStatusEvent {
+  id: number;
+  status: string;
+}
+
 export const orderApi = {
   createOrder: async () => {
     try {
-      const response = await api.post<Order>('/orders/create/', {});
+      // Retries of this request (e.g. after a token refresh) reuse the key
+      const response = await api.post<Order>('/orders/create/', {}, {
+        headers: { 'Idempotency-Key': crypto.randomUUID() }
+      });
       return response.data;
     } catch (error) {
       console.error('Error creating order:', error);
@@ -48,5 +66,79 @@ export const orderApi = {
       console.error('Error fetching order details:', error);
       throw error;
     }
+  },
+
+  // Listen for status changes of the user's orders (server-sent events).
+  // EventSource can't send headers, so each connection is opened with a
+  // single-use ticket obtained with the access token. A spent ticket can't be
+  // retried, so after an error the stream is reopened with a fresh one, backing
+  // off while it keeps failing, and once it is open again the order history is
+  // re-read to pick up changes made while disconnected. Gives up for good when
+  // the ticket request fails with one of ORDER_EVENTS_FATAL_STATUSES.
+  subscribeToOrderEvents: (onStatus: (event: OrderStatusEvent) => void) => {
+    if (!localStorage.getItem(ACCESS_TOKEN)) {
+      return () => {};
+    }
+
+    let source: EventSource | null = null;
+    let retryTimer: number | undefined;
+    let failures = 0;
+    let closed = false;
+
+    const retry = () => {
+      if (!closed) {
+        const delay = Math.min(ORDER_EVENTS_RETRY_MS * 2 ** failures, ORDER_EVENTS_MAX_RETRY_MS);
+        failures += 1;
+        // Jitter keeps clients cut off together from reconnecting together
+        retryTimer = window.setTimeout(() => connect(true), delay * (0.5 + Math.random() / 2));
+      }
+    };
+
+    const refreshStatuses = async () => {
+      const { data: orders } = await api.get<Order[]>('/orders/');
+      for (const { id, status } of orders) {
+        if (id !== undefined) {
+          onStatus({ id, status });
+        }
+      }
+    };
+
+    const connect = async (reconnecting: boolean) => {
+      try {
+        const { data } = await api.post<{ ticket: string }>('/orders/events/ticket/', {});
+        if (closed) return;
+        source = new EventSource(
+          `${import.meta.env.VITE_API_URL}/async/orders/events/?ticket=${encodeURIComponent(data.ticket)}`
+        );
+        source.addEventListener('order-status', (message) => {
+          onStatus(JSON.parse((message as MessageEvent).data));
+        });
+        source.onopen = () => {
+          failures = 0;
+          if (reconnecting) {
+            reconnecting = false;
+            refreshStatuses().catch((error) => console.error('Error fetching orders:', error));
+          }
+        };
+        source.onerror = () => {
+          source?.close();
+          retry();
+        };
+      } catch (error) {
+        if (axios.isAxiosError(error) && ORDER_EVENTS_FATAL_STATUSES.includes(error.response?.status ?? 0)) {
+          console.warn('Order events are unavailable:', error.message);
+          return;
+        }
+        console.error('Error subscribing to order events:', error);
+        retry();
+      }
+    };
+
+    connect(false);
+    return () => {
+      closed = true;
+      window.clearTimeout(retryTimer);
+      source?.close();
+    };
   }
-};
\ No newline at end of file
+};
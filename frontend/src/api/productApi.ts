@@ -16,6 +16,14 @@ export interface Product {
   ingredients: string | null;
   serving_size: string | null;
   dietary_info: string | null;
+  dietary_tags?: string[];
+}
+
+export interface PaginatedResponse<T> {
+  count: number;
+  next: string | null;
+  previous: string | null;
+  results: T[];
 }
 
 export interface CategoryOption {
@@ -33,13 +41,34 @@ export const productApi = {
 
   // Get products by category
   getProductsByCategory: async (category: string): Promise<Product[]> => {
-    const response = await api.get<Product[]>(`/products/category/${category}/`);
+    // legacy=true keeps the bare-array response until the grid pages through results
+    const response = await api.get<Product[]>(`/products/category/${category}/`, {
+      params: { legacy: true }
+    });
     return response.data;
   },
 
   // Add search products function
   searchProducts: async (query: string): Promise<Product[]> => {
-    const response = await api.get<Product[]>(`/products/search?q=${encodeURIComponent(query)}`);
-    return response.data;
+    const response = await api.get<PaginatedResponse<Product>>('/products/search/', {
+      params: { q: query }
+    });
+    return response.data.results;
+  },
+
+  // Products frequently ordered together with a product
+  getProductRecommendations: async (productId: number, limit: number = 10): Promise<Product[]> => {
+    const response = await api.get<{ results: Product[] }>(`/recommendations/products/${productId}/`, {
+      params: { limit }
+    });
+    return response.data.results;
+  },
+
+  // Products frequently ordered together with the user's cart
+  getCartRecommendations: async (limit: number = 10): Promise<Product[]> => {
+    const response = await api.get<{ results: Product[] }>('/recommendations/cart/', {
+      params: { limit }
+    });
+    return response.data.results;
   }
 };
\ No newline at end of file
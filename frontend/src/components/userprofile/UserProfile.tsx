@@ -24,6 +24,7 @@ const UserProfilePage = () => {
   const { 
     orders, 
     fetchOrders, 
+    subscribeToOrderUpdates,
     isLoading: ordersLoading 
   } = useOrderStore();
   
@@ -57,6 +58,14 @@ const UserProfilePage = () => {
     }
   }, [hasCheckedAuth, isAuthenticated, dataFetched, fetchFavorites, fetchOrders]);
 
+  // Keep order statuses live while the profile is open
+  useEffect(() => {
+    if (!hasCheckedAuth || !isAuthenticated) {
+      return;
+    }
+    return subscribeToOrderUpdates();
+  }, [hasCheckedAuth, isAuthenticated, subscribeToOrderUpdates]);
+
   // Only refresh user data when modal is closed with shouldRefreshUser flag
   useEffect(() => {
     if (shouldRefreshUser && isAuthenticated) {
@@ -254,9 +254,22 @@ const useAuthStore = create<AuthState>((set, get) => ({
       console.log('Profile picture upload complete response:', response);
       console.log('Response data:', response.data);
       
-      if (response.data) {
+      // Uploads are processed in the background; wait for the job to finish
+      let result = response.data;
+      if (response.status === 202 && result?.job_id) {
+        for (let attempt = 0; attempt < 30 && result.status !== 'Done' && result.status !== 'Failed'; attempt++) {
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          result = (await api.get(`/profile/picture/jobs/${result.job_id}/`)).data;
+        }
+        if (result.status !== 'Done') {
+          set({ error: result.error || "Profile picture is still processing", isLoading: false });
+          return undefined;
+        }
+      }
+      
+      if (result) {
         // Try to extract the profile picture URL, handling different response formats
-        const profilePicture = response.data.profile_picture || response.data.url || response.data;
+        const profilePicture = result.profile_picture || result.url || result;
         console.log('Extracted profile picture URL:', profilePicture);
         
         // Update the user object in the store
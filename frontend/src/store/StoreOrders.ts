@@ -9,6 +9,7 @@ interface OrderState {
   
   createOrder: () => Promise<void>;
   fetchOrders: () => Promise<void>;
+  subscribeToOrderUpdates: () => () => void;
   clearError: () => void;
 }
 
@@ -56,6 +57,15 @@ export const useOrderStore = create<OrderState>()(
         }
       },
 
+      // Apply pushed status changes instead of polling the order history
+      subscribeToOrderUpdates: () => orderApi.subscribeToOrderEvents(({ id, status }) => {
+        set((state) => ({
+          orders: state.orders.map((order) => 
+            order.id === id ? { ...order, status } : order
+          )
+        }));
+      }),
+
       clearError: () => set({ error: null })
     }),
     { name: 'OrderStore' }